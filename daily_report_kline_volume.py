@@ -1,11 +1,12 @@
 # daily_report_kline_volume.py
 import os
-import sys
 import logging
+from itertools import chain
+from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
 import pymysql
-from utils import load_config, init_db
+from utils import load_config, init_db, setup_logging, ci_index, ci_lookup, config_cache, timestamp_is_datetime
 
 # --- 通知模块：Teams（必有） ---
 try:
@@ -23,57 +24,18 @@ except ImportError:
 
 logger = logging.getLogger('monitor_system')
 
-# ---------- 日志 ----------
-def setup_logging():
-    if logger.handlers:
-        return
-    logger.setLevel(logging.INFO)
-    fmt = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-                            datefmt='%Y-%m-%d %H:%M:%S')
-    ch = logging.StreamHandler(sys.stdout)
-    ch.setLevel(logging.INFO)
-    ch.setFormatter(fmt)
-    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'daily_report_log.log')
-    fh = logging.FileHandler(log_file, encoding='utf-8')
-    fh.setLevel(logging.INFO)
-    fh.setFormatter(fmt)
-    root = logging.getLogger('monitor_system')
-    root.addHandler(ch)
-    root.addHandler(fh)
-    root.setLevel(logging.INFO)
+FETCH_BATCH = 5000  # 流式游标每次 fetchmany 的行数
 
 # ---------- 工具 ----------
 Number = Union[int, float]
-TS = Union[int, float, datetime]
-
-def _ci_get(d: dict, key: str):
-    if not isinstance(d, dict):
-        return None, None
-    t = key.strip().lower()
-    for k, v in d.items():
-        if isinstance(k, str) and k.strip().lower() == t:
-            return v, k
-    return None, None
-
-def _to_float(x) -> float:
-    try:
-        return float(x)
-    except Exception:
-        return 0.0
+
+_TS_FMT = '%Y-%m-%d %H:%M'
 
 def _fmt_pct(x: float) -> str:
-    try:
+    # 显式类型判断代替 try/except（bool 是 int 子类，一并排除）；NaN（x != x）同样输出 N/A
+    if isinstance(x, (int, float)) and not isinstance(x, bool) and x == x:
         return f"{x:+.2%}"
-    except Exception:
-        return "N/A"
-
-def _fmt_ts(ts: TS) -> str:
-    if isinstance(ts, datetime):
-        return ts.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M')
-    try:
-        return datetime.utcfromtimestamp(_to_float(ts) / 1000.0).strftime('%Y-%m-%d %H:%M')
-    except Exception:
-        return "N/A"
+    return "N/A"
 
 # ---------- 时间戳模式 ----------
 class TsMode:
@@ -81,100 +43,214 @@ class TsMode:
     DATETIME = "datetime"
 
 def detect_ts_mode(conn, table: str) -> str:
-    sql = f"SELECT timestamp FROM {table} ORDER BY timestamp DESC LIMIT 1"
-    with conn.cursor() as c:
-        c.execute(sql)
-        row = c.fetchone()
-    if not row:
-        return TsMode.MS_INT
-    ts = row[0] if isinstance(row, (list, tuple)) else row.get('timestamp')
-    return TsMode.DATETIME if isinstance(ts, datetime) else TsMode.MS_INT
-
-def make_range_predicate(ts_mode: str, start_utc: datetime, end_utc: datetime):
+    # 列类型探测与缓存共用 utils.timestamp_is_datetime；空表探测不到时按毫秒整数处理
+    return TsMode.DATETIME if timestamp_is_datetime(conn, table) else TsMode.MS_INT
+
+def make_range_predicate(ts_mode: str, start_utc: datetime, end_utc: datetime, col: str = "timestamp"):
+    where = f"{col} >= %s AND {col} < %s"
     if ts_mode == TsMode.DATETIME:
-        return "timestamp >= %s AND timestamp < %s", (start_utc, end_utc)
+        return where, (start_utc, end_utc)
     else:
-        return "timestamp >= %s AND timestamp < %s", (
-            int(start_utc.timestamp() * 1000), int(end_utc.timestamp() * 1000))
+        return where, (int(start_utc.timestamp() * 1000), int(end_utc.timestamp() * 1000))
+
+# ---------- 索引检查 ----------
+_INDEX_LEAD_COLS = {'symbol', 'exchange'}
+_OHLCV_COLS = {'open', 'high', 'low', 'close', 'volume'}
+
+def check_kline_index(conn, table: str) -> Optional[str]:
+    """
+    确认表上存在以 (symbol, exchange, timestamp)（前两列顺序不限）开头的索引，返回索引名；
+    没有则告警并给出建议 DDL（不自动建索引，避免在线上表上加锁）。
+    """
+    sql = """
+        SELECT INDEX_NAME, COLUMN_NAME
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """
+    with conn.cursor() as c:
+        c.execute(sql, (table,))
+        rows = c.fetchall() or []
+    indexes: Dict[str, List[str]] = {}
+    for name, col in rows:
+        indexes.setdefault(name, []).append(str(col).lower())
+
+    for name, cols in indexes.items():
+        if set(cols[:2]) == _INDEX_LEAD_COLS and cols[2:3] == ['timestamp']:
+            if not _OHLCV_COLS.issubset(cols):
+                logger.info(f"[日报] 使用索引 {name}{tuple(cols)}（非覆盖索引，需回表读取 OHLCV）。")
+            return name
+
+    logger.warning(
+        f"[日报] 表 {table} 缺少 (symbol, exchange, timestamp) 前缀索引，查询将退化为大范围扫描。建议：\n"
+        f"CREATE INDEX idx_sym_ex_ts ON {table} "
+        f"(symbol, exchange, timestamp, `open`, `high`, `low`, `close`, volume);"
+    )
+    return None
 
 # ---------- 阈值读取 ----------
+_PRICE_FIELDS = ('OPEN', 'HIGH', 'LOW', 'CLOSE')
+
+# 按 symbol 缓存解析结果（utils.config_cache：随 config 对象失效）
+_REPORT_CACHE: dict = {}
+
+def _report_cache(config: dict) -> dict:
+    return config_cache(_REPORT_CACHE, config, 'sym_idx', 'price', 'price_vec', 'volume')
+
+def _symbol_idx(rc: dict, symbol: str) -> dict:
+    idx = rc['sym_idx'].get(symbol)
+    if idx is None:
+        sym_map = ci_lookup(rc['ac_idx'], 'SYMBOL_THRESHOLDS') or {}
+        idx = rc['sym_idx'][symbol] = ci_index(sym_map.get(symbol) or {})
+    return idx
+
+def _pick(rc: dict, sym_idx: dict, key: str, default):
+    """symbol 覆盖优先，其次全局 ALERT_CONFIG，键名大小写不敏感"""
+    sv = ci_lookup(sym_idx, key)
+    if sv is not None:
+        return sv
+    gv = ci_lookup(rc['ac_idx'], key)
+    return gv if gv is not None else default
+
 def read_price_thresholds(config: dict, symbol: str) -> Dict[str, float]:
-    ac = (config or {}).get('ALERT_CONFIG', {}) or {}
-    sym_map = _ci_get(ac, 'SYMBOL_THRESHOLDS')[0] or {}
-    sym_conf = sym_map.get(symbol) or {}
-
-    def pick(name: str, default: float) -> float:
-        sv, _ = _ci_get(sym_conf, name)
-        gv, _ = _ci_get(ac, name)
-        val = sv if sv is not None else (gv if gv is not None else default)
+    rc = _report_cache(config)
+    cached = rc['price'].get(symbol)
+    if cached is not None:
+        return cached
+    sym_idx = _symbol_idx(rc, symbol)
+
+    def pick(key: str, default: float) -> float:
         try:
-            return float(val)
+            return float(_pick(rc, sym_idx, key, default))
         except Exception:
             return default
 
-    return {
+    thr = rc['price'][symbol] = {
         "OPEN":  pick('OPEN_DEVIATION_THRESHOLD',  0.002),
         "HIGH":  pick('HIGH_DEVIATION_THRESHOLD',  0.001),
         "LOW":   pick('LOW_DEVIATION_THRESHOLD',   0.001),
         "CLOSE": pick('CLOSE_DEVIATION_THRESHOLD', 0.0005),
     }
+    return thr
 
 def read_volume_params(config: dict, symbol: str) -> Tuple[float, float]:
-    ac = (config or {}).get('ALERT_CONFIG', {}) or {}
-    sym_map = _ci_get(ac, 'SYMBOL_THRESHOLDS')[0] or {}
-    sym_conf = sym_map.get(symbol) or {}
-    tr_sym, _ = _ci_get(sym_conf, 'VOLUME_TARGET_RATIO')
-    tr_glb, _ = _ci_get(ac, 'VOLUME_TARGET_RATIO')
-    target_ratio = tr_sym if tr_sym is not None else (tr_glb if tr_glb is not None else 0.20)
-    tol_sym, _ = _ci_get(sym_conf, 'VOLUME_RATIO_THRESHOLD')
-    tol_glb, _ = _ci_get(ac, 'VOLUME_RATIO_THRESHOLD')
-    tolerance = tol_sym if tol_sym is not None else (tol_glb if tol_glb is not None else 0.20)
+    rc = _report_cache(config)
+    cached = rc['volume'].get(symbol)
+    if cached is not None:
+        return cached
+    sym_idx = _symbol_idx(rc, symbol)
+    target_ratio = _pick(rc, sym_idx, 'VOLUME_TARGET_RATIO', 0.20)
+    tolerance = _pick(rc, sym_idx, 'VOLUME_RATIO_THRESHOLD', 0.20)
     try:
-        return float(target_ratio), float(tolerance)
+        params = (float(target_ratio), float(tolerance))
     except Exception:
-        return 0.2, 0.2
+        params = (0.2, 0.2)
+    rc['volume'][symbol] = params
+    return params
+
+PriceThrVec = Tuple[float, float, float, float]
+
+def read_price_threshold_vec(config: dict, symbol: str) -> PriceThrVec:
+    """四价阈值按 (OPEN, HIGH, LOW, CLOSE) 排成元组，供聚合直接按下标取用；随 config 缓存。"""
+    rc = _report_cache(config)
+    vec = rc['price_vec'].get(symbol)
+    if vec is None:
+        thr = read_price_thresholds(config, symbol)
+        vec = rc['price_vec'][symbol] = tuple(thr[f] for f in _PRICE_FIELDS)
+    return vec
+
+def read_symbol_params(config: dict, symbol: str) -> Tuple[PriceThrVec, Tuple[float, float]]:
+    """一次取回某 symbol 的四价阈值向量与 (volume_target_ratio, volume_ratio_threshold)，共用同一份 symbol 配置视图。"""
+    return read_price_threshold_vec(config, symbol), read_volume_params(config, symbol)
 
 # ---------- DB 拉取 ----------
-def fetch_ohlc_in_range(conn, table: str, symbol: str, exchange: str,
-                        ts_mode: str, start_utc: datetime, end_utc: datetime) -> List[dict]:
-    where, params = make_range_predicate(ts_mode, start_utc, end_utc)
+def fetch_aligned_ohlc_in_range(conn, table: str, symbols: List[str], a_exchange: str, b_exchange: str,
+                                where: str, params: tuple,
+                                index_name: Optional[str] = None) -> Dict[str, List[tuple]]:
+    """
+    一条 SQL 拉取全部 symbol：在库内按 (symbol, timestamp) 自连接 A/B 两侧，只返回两侧都存在的 K 线，
+    再单遍按 symbol 分组，返回 {SYMBOL(大写): rows}。不带 ORDER BY：计数与成交量求和与行序无关，省去库内排序。
+    where/params：make_range_predicate(..., col="a.timestamp") 的结果（整轮只算一次）。
+    每行为元组：(timestamp, a_open, a_high, a_low, a_close, a_volume, b_open, b_high, b_low, b_close, b_volume, symbol)
+    价格/成交量列在库内 `COALESCE(x, 0) + 0E0` 转为 DOUBLE：DECIMAL 列也直接返回 float、NULL 记 0，
+    客户端不再逐格构造 Decimal 或做 float 转换（CAST(... AS DOUBLE) 需 MySQL 8.0.17+，加 0E0 在 5.7 上同样可用）。
+    index_name：check_kline_index 找到的 (symbol, exchange, timestamp) 前缀索引，两侧都加 USE INDEX 提示，
+    避免优化器改走只含 timestamp 的索引做大范围扫描；为 None 时不加提示。
+    """
+    placeholders = ",".join(["%s"] * len(symbols))
+    hint = f" USE INDEX (`{index_name}`)" if index_name else ""
     sql = f"""
-        SELECT timestamp, `open`, `high`, `low`, `close`, volume
-        FROM {table}
-        WHERE symbol=%s AND exchange=%s AND {where}
-        ORDER BY timestamp ASC
+        SELECT a.timestamp,
+               COALESCE(a.`open`, 0) + 0E0 AS a_open, COALESCE(a.`high`, 0) + 0E0 AS a_high,
+               COALESCE(a.`low`, 0) + 0E0 AS a_low, COALESCE(a.`close`, 0) + 0E0 AS a_close,
+               COALESCE(a.volume, 0) + 0E0 AS a_volume,
+               COALESCE(b.`open`, 0) + 0E0 AS b_open, COALESCE(b.`high`, 0) + 0E0 AS b_high,
+               COALESCE(b.`low`, 0) + 0E0 AS b_low, COALESCE(b.`close`, 0) + 0E0 AS b_close,
+               COALESCE(b.volume, 0) + 0E0 AS b_volume,
+               a.symbol
+        FROM {table} a{hint}
+        JOIN {table} b{hint}
+          ON b.symbol = a.symbol AND b.timestamp = a.timestamp AND b.exchange = %s
+        WHERE a.exchange=%s AND a.symbol IN ({placeholders}) AND {where}
     """
-    args = (symbol, exchange, *params)
-    with conn.cursor(cursor=pymysql.cursors.DictCursor) as c:
+    args = (b_exchange, a_exchange, *symbols, *params)
+    # IN 过滤按库的排序规则大小写不敏感，库内写法可能与配置不同：分组键统一大写
+    by_sym: Dict[str, List[tuple]] = {sym.upper(): [] for sym in symbols}
+    # SSCursor：服务端流式读取，逐行产出元组，不在客户端缓冲整份结果，也不为每行建 dict
+    # 按 FETCH_BATCH 分块取：内存占用恒定，且每块只回一次 Python 层
+    with conn.cursor(pymysql.cursors.SSCursor) as c:
         c.execute(sql, args)
-        return c.fetchall() or []
+        while True:
+            batch = c.fetchmany(FETCH_BATCH)
+            if not batch:
+                break
+            for r in batch:
+                key = r[11].upper()
+                bucket = by_sym.get(key)
+                if bucket is None:
+                    bucket = by_sym.setdefault(key, [])
+                bucket.append(r)
+    return by_sym
 
 # ---------- 统计 ----------
-def aggregate_daily_for_symbol(rows_a: List[dict], rows_b: List[dict],
-                               price_thresholds: Dict[str, float],
-                               volume_target_ratio: float):
-    map_a = {r['timestamp']: r for r in rows_a}
-    map_b = {r['timestamp']: r for r in rows_b}
-    commons = sorted(set(map_a.keys()) & set(map_b.keys()))
-
-    counts = {'OPEN': 0, 'HIGH': 0, 'LOW': 0, 'CLOSE': 0}
-    exceeds: List[dict] = []
 
-    def check(field_key: str, a_val, b_val, thr, ts):
-        if b_val is None or _to_float(b_val) == 0.0:
-            return
-        rel = abs(_to_float(a_val) - _to_float(b_val)) / abs(_to_float(b_val))
-        if rel > thr:
-            counts[field_key] += 1
-            exceeds.append({'ts': ts, 'field': field_key, 'a': a_val, 'b': b_val, 'rel': rel})
-
-    for ts in commons:
-        ra, rb = map_a[ts], map_b[ts]
-        for field in ['open', 'high', 'low', 'close']:
-            check(field.upper(), ra[field], rb[field], price_thresholds[field.upper()], ts)
-
-    sum_a = sum(_to_float(map_a[t]['volume']) for t in commons)
-    sum_b = sum(_to_float(map_b[t]['volume']) for t in commons)
+def aggregate_daily_for_symbol(rows: List[tuple],
+                               price_thr_vec: PriceThrVec,
+                               volume_target_ratio: float,
+                               collect_exceeds: bool = True):
+    """
+    rows：fetch_aligned_ohlc_in_range 中某个 symbol 的行（A/B 已按 timestamp 对齐，行序不保证）。
+    price_thr_vec：read_price_threshold_vec 的 (OPEN, HIGH, LOW, CLOSE) 阈值元组。
+    collect_exceeds=False 时只计数、不为每次越阈构造明细 dict（摘要只用 counts）；
+    收集明细时在末尾按 ts 排一次序（稳定排序，同一 ts 内仍按 OPEN/HIGH/LOW/CLOSE 顺序）。
+    """
+    # 行转列（SoA）：按列做比较与求和；各列在 SQL 里已是 float（NULL 记 0），无需逐格转换
+    cols = list(zip(*rows)) if rows else [()] * 11
+    ts_col = cols[0]
+    a_cols = cols[1:6]     # A: o, h, l, c, v
+    b_cols = cols[6:11]    # B: o, h, l, c, v
+
+    n_ex = [0, 0, 0, 0]
+    exceeds: List[dict] = []
+    for i, field in enumerate(_PRICE_FIELDS):
+        t = price_thr_vec[i]
+        col_a, col_b = a_cols[i], b_cols[i]
+        if not collect_exceeds:
+            n_ex[i] = sum(1 for a, b in zip(col_a, col_b) if b != 0.0 and abs(a - b) / abs(b) > t)
+            continue
+        for ts, a, b in zip(ts_col, col_a, col_b):
+            if b == 0.0:
+                continue
+            rel = abs(a - b) / abs(b)
+            if rel > t:
+                n_ex[i] += 1
+                exceeds.append({'ts': ts, 'field': field, 'a': a, 'b': b, 'rel': rel})
+    sum_a = sum(a_cols[4], 0.0)
+    sum_b = sum(b_cols[4], 0.0)
+
+    if exceeds:
+        exceeds.sort(key=lambda e: e['ts'])
+    counts = dict(zip(_PRICE_FIELDS, n_ex))
     target = sum_b * volume_target_ratio
     diff_abs = sum_a - target
     diff_rel = diff_abs / target if target else 0.0
@@ -185,6 +261,21 @@ def aggregate_daily_for_symbol(rows_a: List[dict], rows_b: List[dict],
     return {'counts': counts, 'exceeds': exceeds}, volume_stats
 
 # ---------- Markdown 渲染 ----------
+def _summary_line(sym: str, v: dict, total_ex: int) -> str:
+    c = v['price']['counts']
+    dev = v['volume']['diff_rel']
+    r = v['volume_ratio']
+    tol = v['volume_tolerance']
+
+    alert_flag = " ⚠️" if abs(dev) > tol else ""
+
+    # 生成行文本（加粗关键信息）
+    return (
+        f"[{total_ex}] **{sym}**{alert_flag}: "
+        f"O={c['OPEN']} H={c['HIGH']} L={c['LOW']} C={c['CLOSE']} | "
+        f"Vol dev=**{_fmt_pct(dev)}** (r={r:.2f})  \n"
+    )
+
 def render_summary_chunks(report_date_str, start_utc, end_utc, per_symbol: Dict[str, dict]) -> List[Tuple[str, str]]:
     """
     生成日报摘要（Teams Markdown 优化版）
@@ -193,40 +284,21 @@ def render_summary_chunks(report_date_str, start_utc, end_utc, per_symbol: Dict[
     - 异常标记 ⚠️
     - 自动换行
     """
-    total_price_ex = sum(sum(v['price']['counts'].values()) for v in per_symbol.values())
+    # 每个 symbol 的四价越阈合计只算一次，表头与行前缀共用
+    totals = {sym: sum(v['price']['counts'].values()) for sym, v in per_symbol.items()}
+    total_price_ex = sum(totals.values())
     vol_exceed_count = sum(1 for v in per_symbol.values() if abs(v['volume']['diff_rel']) > v['volume_tolerance'])
 
     header = (
         f"📊 **日报（K线+成交量统计）UTC {report_date_str}**\n\n"
-        f"时间：{start_utc.strftime('%Y-%m-%d %H:%M')} ~ {end_utc.strftime('%Y-%m-%d %H:%M')} UTC\n"
+        f"时间：{start_utc.strftime(_TS_FMT)} ~ {end_utc.strftime(_TS_FMT)} UTC\n"
         f"标的数：**{len(per_symbol)}**\n"
         f"四价越阈总次数：**{total_price_ex}**\n"
         f"成交量超阈标的数：**{vol_exceed_count}**\n\n"
     )
 
-    # 排序输出
-    sorted_symbols = sorted(per_symbol.keys())
-
-    body_lines = []
-    for sym in sorted_symbols:
-        v = per_symbol[sym]
-        c = v['price']['counts']
-        dev = v['volume']['diff_rel']
-        r = v['volume_ratio']
-        tol = v['volume_tolerance']
-        total_ex = sum(c.values())
-
-        alert_flag = " ⚠️" if abs(dev) > tol else ""
-
-        # 生成行文本（加粗关键信息）
-        line = (
-            f"[{total_ex}] **{sym}**{alert_flag}: "
-            f"O={c['OPEN']} H={c['HIGH']} L={c['LOW']} C={c['CLOSE']} | "
-            f"Vol dev=**{_fmt_pct(dev)}** (r={r:.2f})  \n"
-        )
-        body_lines.append(line)
-
-    body = header + "".join(body_lines)
+    # 按 symbol 排序输出；表头与各行一次 join，不经中间列表与二次字符串相加
+    body = "".join(chain((header,), (_summary_line(sym, per_symbol[sym], totals[sym]) for sym in sorted(per_symbol))))
     return [(f"📊 日报（K线+成交量统计）UTC {report_date_str}", body)]
 
 
@@ -234,11 +306,13 @@ def render_summary_chunks(report_date_str, start_utc, end_utc, per_symbol: Dict[
 
 # ---------- 主流程 ----------
 def main():
-    setup_logging()
+    setup_logging('daily_report_log.log')
     conn = None
     try:
         config = load_config()
         conn = init_db(config)
+        # 日报全程只读：自动提交，避免隐式事务在多条查询间持有一致性快照
+        conn.autocommit(True)
         teams_cfg = config.get('TEAMS_NOTIFY') or {}
         lark_cfg = config.get('LARK_APP_CONFIG') or {}
 
@@ -259,14 +333,23 @@ def main():
 
         ts_mode = detect_ts_mode(conn, table)
         logger.info(f"[日报] 时间范围（UTC）：{start_utc} ~ {end_utc} | ts_mode={ts_mode}")
+        index_name = None
+        try:
+            index_name = check_kline_index(conn, table)
+        except pymysql.Error as e:
+            logger.warning(f"[日报] 索引检查失败（忽略）：{e}")
+
+        range_where, range_params = make_range_predicate(ts_mode, start_utc, end_utc, col="a.timestamp")
+        conn.ping(reconnect=True)
+        rows_by_sym = fetch_aligned_ohlc_in_range(conn, table, symbols, A_ID, B_ID, range_where, range_params,
+                                                  index_name=index_name)
 
         per_symbol: Dict[str, dict] = {}
         for sym in symbols:
-            price_thr = read_price_thresholds(config, sym)
-            vol_ratio, vol_tol = read_volume_params(config, sym)
-            rows_a = fetch_ohlc_in_range(conn, table, sym, A_ID, ts_mode, start_utc, end_utc)
-            rows_b = fetch_ohlc_in_range(conn, table, sym, B_ID, ts_mode, start_utc, end_utc)
-            price_stats, volume_stats = aggregate_daily_for_symbol(rows_a, rows_b, price_thr, vol_ratio)
+            price_thr_vec, (vol_ratio, vol_tol) = read_symbol_params(config, sym)
+            rows = rows_by_sym.get(sym.upper(), [])
+            price_stats, volume_stats = aggregate_daily_for_symbol(rows, price_thr_vec, vol_ratio,
+                                                                   collect_exceeds=False)
             per_symbol[sym] = {'price': price_stats, 'volume': volume_stats,
                                'volume_ratio': vol_ratio, 'volume_tolerance': vol_tol}
 
@@ -274,14 +357,14 @@ def main():
         out_dir = os.path.join(base_dir, "daily_report_kline_volume")
         os.makedirs(out_dir, exist_ok=True)
         out_path = os.path.join(out_dir, f"daily_report_{report_date_str}_UTC.md")
-        with open(out_path, "w", encoding="utf-8") as f:
-            for _, text in render_summary_chunks(report_date_str, start_utc, end_utc, per_symbol):
-                f.write(text)
+        # 只渲染一次：落盘与推送共用同一份结果
+        chunks = render_summary_chunks(report_date_str, start_utc, end_utc, per_symbol)
+        Path(out_path).write_text("".join(text for _, text in chunks), encoding="utf-8")
         logger.info(f"[日报] 已生成：{out_path}")
 
-        # 发送到 Teams
-        for title, text in render_summary_chunks(report_date_str, start_utc, end_utc, per_symbol):
-            send_teams_alert(teams_cfg, title, text, severity="info")
+        # 发送到 Teams（按段顺序推送，共用同一会话的长连接）
+        for chunk_title, chunk_text in chunks:
+            send_teams_alert(teams_cfg, chunk_title, chunk_text, severity="info")
 
     except Exception as e:
         logger.critical(f"日报生成失败：{e}", exc_info=True)
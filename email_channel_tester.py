@@ -48,10 +48,13 @@ def try_send_smtp(
     if use_ssl and use_starttls:
         raise RuntimeError("use_ssl 与 use_starttls 不能同时为 True")
 
+    # 只序列化一次：回退重试时复用同一份报文
+    payload = msg.as_string()
+
     def smtp_login_and_send(server):
         if username:
             server.login(username, password or "")
-        server.sendmail(mail_from, [rcpt_to], msg.as_string())
+        server.sendmail(mail_from, [rcpt_to], payload)
 
     # 1) 直接 SSL
     if use_ssl:
@@ -70,24 +73,25 @@ def try_send_smtp(
             smtp_login_and_send(s)
         return
 
-    # 3) 未指定：先试 STARTTLS，失败再退明文
-    try:
-        with smtplib.SMTP(host, port, timeout=timeout) as s:
-            s.ehlo()
-            if s.has_extn('starttls'):
+    # 3) 未指定：同一连接上按 EHLO 能力决定是否 STARTTLS；
+    #    只有 STARTTLS 握手本身失败才重连走纯明文（未声明 STARTTLS 时首连就是明文，无需再连一次）
+    with smtplib.SMTP(host, port, timeout=timeout) as s:
+        s.ehlo()
+        tls_failed = False
+        if s.has_extn('starttls'):
+            try:
                 s.starttls(context=ssl.create_default_context()); s.ehlo()
-            if username:
-                s.login(username, password or "")
-            s.sendmail(mail_from, [rcpt_to], msg.as_string())
-        return
-    except Exception as e:
-        print("[WARN] STARTTLS/自动方式失败，尝试纯明文连接… 失败原因：", repr(e))
+            except (ssl.SSLError, smtplib.SMTPException, OSError) as e:
+                print("[WARN] STARTTLS 失败，尝试纯明文连接… 失败原因：", repr(e))
+                tls_failed = True
+                s.close()   # 握手失败后连接状态不可用，直接关闭
+        if not tls_failed:
+            smtp_login_and_send(s)
+            return
 
     with smtplib.SMTP(host, port, timeout=timeout) as s:
         s.ehlo()
-        if username:
-            s.login(username, password or "")
-        s.sendmail(mail_from, [rcpt_to], msg.as_string())
+        smtp_login_and_send(s)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -3,11 +3,11 @@ import time
 import logging
 from datetime import datetime
 import pymysql
-import sys
-import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union, Dict, Tuple, List, Optional
 
-from utils import load_config, init_db
+from utils import load_config, init_db, setup_logging, ci_index, ci_lookup, config_cache, timestamp_is_datetime
 from platform_connector import PlatformConnector
 
 # --- 通知模块：Teams（必有，不存在就不报错） ---
@@ -32,23 +32,10 @@ STALE_LIMIT_DAYS = 2       # 数据过旧阈值（天）
 STALE_LIMIT_MS = STALE_LIMIT_DAYS * 24 * 60 * 60 * 1000
 
 # === 表的 timestamp 列类型：True=DATETIME，False=BIGINT(毫秒) ===
+# 启动时由 utils.timestamp_is_datetime 按实际列类型覆盖；探测失败时保持此默认值
 TIMESTAMP_IS_DATETIME = True
 
-# ================== 日志 ==================
-def setup_logging():
-    if logger.handlers:
-        return
-    logger.setLevel(logging.INFO)
-    fmt = logging.Formatter(
-        '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S',
-    )
-    ch = logging.StreamHandler(sys.stdout); ch.setFormatter(fmt); ch.setLevel(logging.INFO)
-    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kline_monitor_log.log')
-    fh = logging.FileHandler(log_file, encoding='utf-8'); fh.setFormatter(fmt); fh.setLevel(logging.INFO)
-    root_logger = logging.getLogger('monitor_system')
-    root_logger.addHandler(ch); root_logger.addHandler(fh)
-    root_logger.setLevel(logging.INFO)
+UPSERT_CHUNK = 1000        # 单条多行 INSERT 的行数上限（8 参数/行，远低于 65535 占位符与 max_allowed_packet）
 
 # ================== 小工具 ==================
 def now_ms() -> int:
@@ -56,19 +43,12 @@ def now_ms() -> int:
 
 def format_timestamp(ts: Union[int, float, datetime, None]) -> str:
     if ts is None: return "N/A"
-    if isinstance(ts, datetime): dt = ts
-    elif isinstance(ts, (int, float)): dt = datetime.fromtimestamp(ts / 1000.0)
-    else: logger.error(f"format_timestamp 类型错误: {type(ts)}"); return "类型错误"
-    return dt.strftime('%Y-%m-%d %H:%M')
-
-def _ci_get(d: dict, key: str):
-    """大小写不敏感取值，返回 (value, matched_key)"""
-    if not isinstance(d, dict): return None, None
-    t = key.strip().lower()
-    for k, v in d.items():
-        if isinstance(k, str) and k.strip().lower() == t:
-            return v, k
-    return None, None
+    if isinstance(ts, datetime): return ts.strftime('%Y-%m-%d %H:%M')
+    if isinstance(ts, (int, float)):
+        # 毫秒时间戳：localtime + %-格式化，省去构造 datetime 与 strftime（仍为本地时区）
+        tm = time.localtime(ts // 1000)
+        return "%04d-%02d-%02d %02d:%02d" % (tm.tm_year, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min)
+    logger.error(f"format_timestamp 类型错误: {type(ts)}"); return "类型错误"
 
 def _get_symbols(cfg: dict) -> List[str]:
     syms = (
@@ -96,16 +76,26 @@ def _normalize_candle_start(ts_ms: int, interval_ms: int) -> int:
     return (int(ts_ms) // interval_ms) * interval_ms
 
 # ================== 阈值读取 ==================
+# 按 symbol 缓存解析结果（utils.config_cache：随 config 对象失效）
+_THRESHOLDS_CACHE: dict = {}
+
 def _read_price_thresholds(config: dict, symbol: str) -> Tuple[bool, float, float, float, float]:
+    tc = config_cache(_THRESHOLDS_CACHE, config, 'price', 'one_line')
+    cache = tc['price']
+    cached = cache.get(symbol)
+    if cached is not None:
+        return cached
+
     ac = (config or {}).get('ALERT_CONFIG', {}) or {}
-    sym_map = _ci_get(ac, 'SYMBOL_THRESHOLDS')[0] or {}
-    sym_conf = sym_map.get(symbol) or {}
+    ac_idx = tc['ac_idx']
+    sym_map = ci_lookup(ac_idx, 'SYMBOL_THRESHOLDS') or {}
+    sym_idx = ci_index(sym_map.get(symbol) or {})
 
     enabled = bool(ac.get('KLINE_PRICE_ALERT_ENABLED', True))
 
     def pick(key: str, default: float) -> float:
-        sv, _ = _ci_get(sym_conf, key)
-        gv, _ = _ci_get(ac, key)
+        sv = ci_lookup(sym_idx, key)
+        gv = ci_lookup(ac_idx, key)
         val = sv if sv is not None else (gv if gv is not None else default)
         try: return float(val)
         except Exception: return default
@@ -115,13 +105,17 @@ def _read_price_thresholds(config: dict, symbol: str) -> Tuple[bool, float, floa
     th_low   = pick('LOW_DEVIATION_THRESHOLD',   0.001)
     th_close = pick('CLOSE_DEVIATION_THRESHOLD', 0.0005)
 
-    logger.info(
-        f"[{symbol}] 价格阈值：ENABLED={enabled} | "
-        f"OPEN={th_open:.4%}, HIGH={th_high:.4%}, LOW={th_low:.4%}, CLOSE={th_close:.4%}"
-    )
-    return enabled, th_open, th_high, th_low, th_close
+    logger.info("[%s] 价格阈值：ENABLED=%s | OPEN=%.4f%%, HIGH=%.4f%%, LOW=%.4f%%, CLOSE=%.4f%%",
+                symbol, enabled, th_open * 100, th_high * 100, th_low * 100, th_close * 100)
+    cache[symbol] = (enabled, th_open, th_high, th_low, th_close)
+    return cache[symbol]
 
 def _read_one_line_thresholds(config: dict, symbol: str):
+    cache = config_cache(_THRESHOLDS_CACHE, config, 'price', 'one_line')['one_line']
+    cached = cache.get(symbol)
+    if cached is not None:
+        return cached
+
     ac = (config or {}).get('ALERT_CONFIG', {}) or {}
     sym = (ac.get('SYMBOL_THRESHOLDS') or {}).get(symbol, {}) or {}
     enabled         = bool(ac.get('ONE_LINE_KLINE_ALERT_ENABLED', True))
@@ -129,151 +123,283 @@ def _read_one_line_thresholds(config: dict, symbol: str):
     epsilon         = float(sym.get('ONE_LINE_EPSILON', ac.get('ONE_LINE_EPSILON', 0.0)))
     require_streak  = int(ac.get('ALERT_REQUIRE_STREAK', 1))
     cooldown_min    = int(ac.get('ALERT_COOLDOWN_MINUTES', 0))
-    logger.info(f"[{symbol}] 一字线阈值：enabled={enabled} count={count_threshold} eps={epsilon} streak={require_streak} cooldown={cooldown_min}m")
-    return enabled, count_threshold, epsilon, require_streak, cooldown_min
+    logger.info("[%s] 一字线阈值：enabled=%s count=%s eps=%s streak=%s cooldown=%sm",
+                symbol, enabled, count_threshold, epsilon, require_streak, cooldown_min)
+    cache[symbol] = (enabled, count_threshold, epsilon, require_streak, cooldown_min)
+    return cache[symbol]
 
 def _is_one_line(o: float, h: float, l: float, c: float, eps: float) -> bool:
-    return (abs(h-l) <= eps and abs(o-c) <= eps and abs(o-h) <= eps and abs(c-l) <= eps)
+    return max(abs(h-l), abs(o-c), abs(o-h), abs(c-l)) <= eps
 
 # ================== DB 读写（DATETIME/BIGINT 兼容） ==================
-def _get_latest_ts(cursor, table: str, symbol: str, exchange: str) -> Optional[int]:
-    if TIMESTAMP_IS_DATETIME:
-        sql = f"SELECT MAX(UNIX_TIMESTAMP(`timestamp`)*1000) AS ts_ms FROM {table} WHERE symbol=%s AND exchange=%s"
-        cursor.execute(sql, (symbol, exchange))
-        row = cursor.fetchone() or {}
-        ts = row.get('ts_ms')
-        return int(ts) if ts is not None else None
-    else:
-        sql = f"SELECT MAX(`timestamp`) AS ts FROM {table} WHERE symbol=%s AND exchange=%s"
-        cursor.execute(sql, (symbol, exchange))
-        row = cursor.fetchone() or {}
-        ts = row.get('ts')
-        return int(ts) if ts is not None else None
+# ---- SQL 模板：按 (表名, 列类型, 占位符个数) 只拼一次，之后每轮直接复用同一字符串 ----
+# 多行 INSERT：VALUES 后按行数重复 _UPSERT_ROW。pymysql 的 executemany 只在 VALUES 全是裸 %s 时
+# 才改写成多行语句，FROM_UNIXTIME(%s/1000) 会让它退化为逐行执行，因此这里显式拼接
+_UPSERT_ROW = "(%s,%s,{ts},%s,%s,%s,%s,%s)"
+_UPSERT_TPL = """
+    INSERT INTO {table}
+    (exchange, symbol, `timestamp`, open, high, low, close, volume)
+    VALUES {rows}
+    ON DUPLICATE KEY UPDATE
+        open=VALUES(open), high=VALUES(high), low=VALUES(low),
+        close=VALUES(close), volume=VALUES(volume)
+"""
+# 每个 (symbol, exchange) 一段带 LIMIT 的子查询，UNION ALL 拼成一条：各段都走唯一键倒序取前 N 根，
+# 不依赖 MySQL 8 的窗口函数；ts_ms 在库内用 DIV 规整到 K 线开盘时刻（参数: interval_ms 两次）
+_RECENT_PART_TPL = """
+    (SELECT exchange, symbol, ({ts} DIV %s) * %s AS ts_ms, open, high, low, close
+     FROM {table}
+     WHERE symbol = %s AND exchange = %s
+     ORDER BY `timestamp` DESC
+     LIMIT %s)
+"""
+_LATEST_TPL = """
+    SELECT exchange, symbol, {ts} AS ts_ms
+    FROM {table}
+    WHERE exchange IN ({ex_ph}) AND symbol IN ({sym_ph})
+    GROUP BY exchange, symbol
+"""
+_SQL_CACHE: Dict[tuple, str] = {}
+
+def _kline_sql(kind: str, table: str, n_ex: int = 0, n_sym: int = 0, n_pairs: int = 0) -> str:
+    key = (kind, table, TIMESTAMP_IS_DATETIME, n_ex, n_sym, n_pairs)
+    sql = _SQL_CACHE.get(key)
+    if sql is None:
+        dt = TIMESTAMP_IS_DATETIME
+        if kind == 'upsert':
+            row = _UPSERT_ROW.format(ts="FROM_UNIXTIME(%s/1000)" if dt else "%s")
+            sql = _UPSERT_TPL.format(table=table, rows=",".join([row] * n_pairs))
+        elif kind == 'recent':
+            part = _RECENT_PART_TPL.format(table=table, ts="UNIX_TIMESTAMP(`timestamp`)*1000" if dt else "`timestamp`")
+            sql = " UNION ALL ".join([part] * n_pairs)
+        elif kind == 'latest':
+            # DATETIME 模式下先 MAX 再 UNIX_TIMESTAMP，只对每组的一个值做转换
+            sql = _LATEST_TPL.format(table=table,
+                                     ts="UNIX_TIMESTAMP(MAX(`timestamp`))*1000" if dt else "MAX(`timestamp`)",
+                                     ex_ph=",".join(["%s"] * n_ex), sym_ph=",".join(["%s"] * n_sym))
+        else:
+            raise ValueError(f"未知 SQL 类型: {kind}")
+        # 多行 upsert 只缓存满块；尾块行数每轮不同，现拼即可，避免缓存随行数无限增多
+        if kind != 'upsert' or n_pairs == UPSERT_CHUNK:
+            _SQL_CACHE[key] = sql
+    return sql
 
-def _upsert_klines(conn, cursor, table: str, exchange: str, symbol: str, rows: List[list], interval_ms: int):
+def _get_latest_ts_bulk(cursor, table: str, exchanges: List[str], symbols: List[str]) -> Dict[Tuple[str, str], int]:
+    """
+    一次 GROUP BY 取回全部 (exchange, symbol) 的最新 ts_ms，键统一大写；没有数据的组合不在结果中。
+    MAX 可走 (exchange, symbol, timestamp) 索引。
+    """
+    if not exchanges or not symbols:
+        return {}
+    sql = _kline_sql('latest', table, len(exchanges), len(symbols))
+    cursor.execute(sql, (*exchanges, *symbols))
+    latest: Dict[Tuple[str, str], int] = {}
+    for exchange, symbol, ts in cursor.fetchall() or ():
+        if ts is not None:
+            latest[(str(exchange).upper(), str(symbol).upper())] = int(ts)
+    return latest
+
+# (EXCHANGE, SYMBOL) -> 库内最新 ts_ms（None=库内无数据）。首次出现的组合用 _get_latest_ts_bulk 预热一次，
+# 之后每轮入库提交成功后在内存中推进，其余周期不再为增量起点读库。
+# 运行约束：内存水位假定本进程是该表唯一写入方。若有其他进程回补、或库内数据被删除/裁剪，
+# 水位会领先于库内实际数据，缺口要等下次重新预热才会补拉——因此每 WATERMARK_REFRESH_CYCLES 轮、
+# 以及数据库重连后都整体丢弃，重新从库内 MAX(timestamp) 预热
+WATERMARK_REFRESH_CYCLES = 30
+_WATERMARKS: Dict[Tuple[str, str], Optional[int]] = {}
+_WATERMARK_CYCLES = {'n': 0}
+
+def _reset_watermarks():
+    _WATERMARKS.clear()
+    _WATERMARK_CYCLES['n'] = 0
+
+def _latest_watermarks(cursor, table: str, exchanges: List[str], symbols: List[str]) -> Dict[Tuple[str, str], Optional[int]]:
+    """返回本轮全部 (EXCHANGE, SYMBOL) 的水位；缺失的 symbol 才读库，配置里已移除的组合顺带清掉。"""
+    _WATERMARK_CYCLES['n'] += 1
+    if _WATERMARK_CYCLES['n'] > WATERMARK_REFRESH_CYCLES:
+        _reset_watermarks()
+        _WATERMARK_CYCLES['n'] = 1
+    wanted = {(ex.upper(), sym.upper()) for ex in exchanges for sym in symbols}
+    for key in [k for k in _WATERMARKS if k not in wanted]:
+        del _WATERMARKS[key]
+    missing = [sym for sym in symbols if any((ex.upper(), sym.upper()) not in _WATERMARKS for ex in exchanges)]
+    if missing:
+        fetched = _get_latest_ts_bulk(cursor, table, exchanges, missing)
+        for ex in exchanges:
+            for sym in missing:
+                key = (ex.upper(), sym.upper())
+                _WATERMARKS[key] = fetched.get(key)
+    return {key: _WATERMARKS[key] for key in wanted}
+
+def _advance_watermarks(rows: List[tuple]):
+    """入库提交成功后调用：rows 为 _normalize_rows 的结果，只推进已预热过的组合。"""
+    for exchange, symbol, ts_ms, *_ in rows:
+        key = (exchange.upper(), symbol.upper())
+        if key in _WATERMARKS:
+            cur = _WATERMARKS[key]
+            if cur is None or ts_ms > cur:
+                _WATERMARKS[key] = ts_ms
+
+def _normalize_rows(exchange: str, symbol: str, rows: List[list], interval_ms: int,
+                    min_ts: Optional[int] = None) -> List[tuple]:
     """
     rows: 每条 K 线至少包含 [ts_ms, open, high, low, close, volume]
-    入库前会将 ts 规整到 K 线“开盘时刻”。
-    需要表有唯一键 (exchange, symbol, timestamp) 以便去重。
+    返回可直接入库的 (exchange, symbol, ts_ms, o, h, l, c, v)，ts 已规整到 K 线“开盘时刻”；解析失败的行丢弃。
+    min_ts（库内最新 ts）：先只解析 ts，早于它的行直接跳过、不做 float 转换；
+    等于它的那根保留（可能是上轮未收盘的 K 线，需要覆盖更新）。
     """
-    if not rows:
-        return
-
-    # 规整 ts 到开盘边界
     normed = []
     for r in rows:
         try:
-            ts_ms = int(r[0])
-            ts_ms = _normalize_candle_start(ts_ms, interval_ms)
-            o, h, l, c, v = float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5])
-            normed.append((ts_ms, o, h, l, c, v))
+            ts_ms = (int(r[0]) // interval_ms) * interval_ms
+            if min_ts is not None and ts_ms < min_ts:
+                continue
+            normed.append((exchange, symbol, ts_ms,
+                           float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5])))
         except Exception:
             continue
-    if not normed:
+    return normed
+
+def _flush_upserts(conn, cursor, table: str, pending: List[tuple]):
+    """
+    一轮只写一次：把本轮所有 (exchange, symbol) 的规整行按 UPSERT_CHUNK 分块，每块一条多行 INSERT，最后提交一次。
+    需要表有唯一键 (exchange, symbol, timestamp) 以便去重。
+    """
+    if not pending:
         return
 
-    if TIMESTAMP_IS_DATETIME:
-        sql = f"""
-            INSERT INTO {table} 
-            (exchange, symbol, `timestamp`, open, high, low, close, volume)
-            VALUES (%s,%s,FROM_UNIXTIME(%s/1000),%s,%s,%s,%s,%s)
-            ON DUPLICATE KEY UPDATE 
-                open=VALUES(open), high=VALUES(high), low=VALUES(low),
-                close=VALUES(close), volume=VALUES(volume)
-        """
-        data = [(exchange, symbol, ts, o, h, l, c, v) for (ts, o, h, l, c, v) in normed]
-    else:
-        sql = f"""
-            INSERT INTO {table} 
-            (exchange, symbol, `timestamp`, open, high, low, close, volume)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            ON DUPLICATE KEY UPDATE 
-                open=VALUES(open), high=VALUES(high), low=VALUES(low),
-                close=VALUES(close), volume=VALUES(volume)
-        """
-        data = [(exchange, symbol, ts, o, h, l, c, v) for (ts, o, h, l, c, v) in normed]
-
-    cursor.executemany(sql, data)
+    for i in range(0, len(pending), UPSERT_CHUNK):
+        chunk = pending[i:i + UPSERT_CHUNK]
+        cursor.execute(_kline_sql('upsert', table, n_pairs=len(chunk)), [v for row in chunk for v in row])
     conn.commit()
-    logger.info(f"[{symbol}] {exchange} 入库/更新 {len(data)} 条 K 线。")
-
-def _select_recent_rows(cursor, table: str, symbol: str, exchange: str, limit: int, interval_ms: int) -> List[dict]:
-    """读取最近 limit 条，统一返回 ts_ms 字段（且再做一次规整，以防历史数据里混入未规整 ts）"""
-    if TIMESTAMP_IS_DATETIME:
-        sql = f"""
-            SELECT UNIX_TIMESTAMP(`timestamp`)*1000 AS ts_ms, open, high, low, close
-            FROM {table}
-            WHERE symbol = %s AND exchange = %s
-            ORDER BY `timestamp` DESC
-            LIMIT {int(limit)}
-        """
-    else:
-        sql = f"""
-            SELECT `timestamp` AS ts_ms, open, high, low, close
-            FROM {table}
-            WHERE symbol = %s AND exchange = %s
-            ORDER BY `timestamp` DESC
-            LIMIT {int(limit)}
-        """
-    cursor.execute(sql, (symbol, exchange))
-    rows = cursor.fetchall() or []
-    # 再规整一次，避免历史数据中有未规整 ts（只在内存中规整用于对齐）
-    for r in rows:
-        r['ts_ms'] = _normalize_candle_start(int(r['ts_ms']), interval_ms)
-    return rows
+    logger.info(f"本轮入库/更新 {len(pending)} 条 K 线（单次提交）。")
+
+# 最近 K 线行：元组游标按列位置取值后包一层 namedtuple，免去 DictCursor 每行建 dict 的开销
+RecentRow = namedtuple('RecentRow', 'ts_ms open high low close')
+
+def _select_recent_rows_bulk(cursor, table: str, pairs: List[Tuple[str, str]],
+                             limit: int, interval_ms: int) -> Dict[Tuple[str, str], List[RecentRow]]:
+    """
+    一条查询读回全部 (exchange, symbol) 的最近 limit 条，按 (EXCHANGE, SYMBOL) 大写键分组，
+    组内保持 ts 倒序；统一返回 ts_ms 字段（SQL 内已再做一次规整，以防历史数据里混入未规整 ts）。
+    cursor 需为元组游标（列顺序见 _RECENT_PART_TPL）。
+    """
+    out: Dict[Tuple[str, str], List[RecentRow]] = {(ex.upper(), sym.upper()): [] for ex, sym in pairs}
+    if not pairs:
+        return out
+    sql = _kline_sql('recent', table, n_pairs=len(pairs))
+    params: list = []
+    for ex, sym in pairs:
+        params.extend((interval_ms, interval_ms, sym, ex, int(limit)))
+    cursor.execute(sql, params)
+    for exchange, symbol, *vals in cursor.fetchall() or ():
+        out.setdefault((str(exchange).upper(), str(symbol).upper()), []).append(RecentRow(*vals))
+    # UNION ALL 不保证保留各段内的 ORDER BY，组内再按 ts 倒序排一次（稳定排序，数据量仅 N 根）
+    for rows in out.values():
+        rows.sort(key=lambda r: r.ts_ms, reverse=True)
+    return out
 
 # ================== 拉取 → 入库（每轮执行） ==================
-def _ingest_latest_for(conn, cursor, table: str, connector: PlatformConnector,
-                       exchange_id: str, symbol: str, timeframe: str, interval_ms: int):
+def _resolve_start_ms(latest_ts: Optional[int], exchange_id: str, symbol: str, interval_ms: int) -> int:
     """
-    逻辑：
+    增量拉取起点（latest_ts 来自 _get_latest_ts_bulk）：
     - 空表/过旧：从 now-RECENT_LIMIT*interval 回补；
-    - 正常：从 latest_ts+interval 增量拉取；
-    - 若本次 fetch 为空，则退化为“最近 RECENT_LIMIT 根”（不带 start）再试一次。
+    - 正常：从 latest_ts+interval 增量拉取。
     """
-    latest_ts = _get_latest_ts(cursor, table, symbol, exchange_id)
     now = now_ms()
 
     if latest_ts is None:
         start_ms = now - RECENT_LIMIT * interval_ms
-        logger.info(f"[{symbol}] {exchange_id} 空表，回补最近 {RECENT_LIMIT} 根（起: {format_timestamp(start_ms)}）。")
+        logger.info("[%s] %s 空表，回补最近 %s 根（起: %s）。", symbol, exchange_id, RECENT_LIMIT, format_timestamp(start_ms))
     else:
         age = now - latest_ts
         if age > STALE_LIMIT_MS:
             start_ms = now - RECENT_LIMIT * interval_ms
-            logger.warning(f"[{symbol}] {exchange_id} 最新数据过旧（{format_timestamp(latest_ts)}），回补最近 {RECENT_LIMIT} 根。")
+            logger.warning("[%s] %s 最新数据过旧（%s），回补最近 %s 根。", symbol, exchange_id, format_timestamp(latest_ts), RECENT_LIMIT)
         else:
             start_ms = latest_ts + interval_ms
-            logger.info(f"[{symbol}] {exchange_id} 增量拉取，自 {format_timestamp(start_ms)} 起。")
+            logger.info("[%s] %s 增量拉取，自 %s 起。", symbol, exchange_id, format_timestamp(start_ms))
+    return start_ms
+
+# (exchange, symbol) -> 上次退化拉取的 now_ms；带 start 的拉取一旦非空即清除
+EMPTY_BACKOFF: Dict[Tuple[str, str], int] = {}
+EMPTY_BACKOFF_CANDLES = 5  # 已有库内数据时，两次退化拉取至少间隔的 K 线根数
+
+def _fetch_latest_for(connector: PlatformConnector, exchange_id: str, symbol: str,
+                      timeframe: str, interval_ms: int, start_ms: int,
+                      latest_ts: Optional[int] = None) -> List[tuple]:
+    """
+    只拉取与规整、不碰数据库：返回 _normalize_rows 的结果，由调用方汇总后 _flush_upserts 一次入库。
+    若本次 fetch 为空，则退化为“最近 RECENT_LIMIT 根”（不带 start）再试一次；
+    库里已有数据（latest_ts 非空）且最近 EMPTY_BACKOFF_CANDLES 根内已退化过时不再重复（空闲/停牌的 symbol）。
+    """
+    key = (exchange_id, symbol)
 
     # 1) 带 start 的拉取
     klines = connector.fetch_ohlcv_history(symbol, timeframe, start_time_ms=start_ms)
     if klines is None:
-        logger.error(f"[{symbol}] {exchange_id} 拉取失败（带 start）；")
+        logger.error("[%s] %s 拉取失败（带 start）；", symbol, exchange_id)
         klines = []
-    logger.info(f"[{symbol}] {exchange_id} fetch(带start) 返回 {len(klines)} 条。")
+    logger.info("[%s] %s fetch(带start) 返回 %d 条。", symbol, exchange_id, len(klines))
     if klines:
-        first_ts = _normalize_candle_start(int(klines[0][0]), interval_ms)
-        last_ts  = _normalize_candle_start(int(klines[-1][0]), interval_ms)
-        logger.info(f"[{symbol}] {exchange_id} fetch 首/尾: {format_timestamp(first_ts)} -> {format_timestamp(last_ts)}")
+        EMPTY_BACKOFF.pop(key, None)
+        if logger.isEnabledFor(logging.DEBUG):
+            first_ts = _normalize_candle_start(int(klines[0][0]), interval_ms)
+            last_ts  = _normalize_candle_start(int(klines[-1][0]), interval_ms)
+            logger.debug("[%s] %s fetch 首/尾: %s -> %s", symbol, exchange_id, format_timestamp(first_ts), format_timestamp(last_ts))
 
     # 2) 若为空，退化为“最近 N 根”
     if not klines:
+        now = now_ms()
+        last = EMPTY_BACKOFF.get(key)
+        if latest_ts is not None and last is not None and now - last < EMPTY_BACKOFF_CANDLES * interval_ms:
+            logger.debug("[%s] %s 带 start 为空，%d 根内已退化拉取过，本轮跳过。", symbol, exchange_id, EMPTY_BACKOFF_CANDLES)
+            return []
+        EMPTY_BACKOFF[key] = now
         alt = connector.fetch_ohlcv_history(symbol, timeframe, start_time_ms=None)
         alt = alt[-RECENT_LIMIT:] if alt else []
-        logger.warning(f"[{symbol}] {exchange_id} 退化拉取：最近 {RECENT_LIMIT} 根，得到 {len(alt)} 条。")
+        logger.warning("[%s] %s 退化拉取：最近 %s 根，得到 %d 条。", symbol, exchange_id, RECENT_LIMIT, len(alt))
         klines = alt
 
     if not klines:
-        logger.error(f"[{symbol}] {exchange_id} 最终无可入库数据。")
-        return
-
-    _upsert_klines(conn, cursor, table, exchange_id, symbol, klines, interval_ms)
+        logger.error("[%s] %s 最终无可入库数据。", symbol, exchange_id)
+        return []
+
+    normed = _normalize_rows(exchange_id, symbol, klines, interval_ms, latest_ts)
+    logger.info("[%s] %s 待入库 %d 条 K 线。", symbol, exchange_id, len(normed))
+    return normed
+
+def _fetch_side(connector: PlatformConnector, exchange_id: str, jobs: List[Tuple[str, int, Optional[int]]],
+                timeframe: str, interval_ms: int) -> List[tuple]:
+    """单个交易所的全部 symbol：在同一线程内串行拉取（连接器自带 1r/s 限速，且不跨线程共享）。"""
+    out: List[tuple] = []
+    for symbol, start_ms, latest_ts in jobs:
+        try:
+            out.extend(_fetch_latest_for(connector, exchange_id, symbol, timeframe, interval_ms, start_ms, latest_ts))
+        except Exception as e:
+            logger.critical(f"[{symbol}] {exchange_id} 拉取发生未知异常: {e}", exc_info=True)
+    return out
 
 # ================== 告警去重/冷却 ==================
-LAST_PRICE_ALERT_END_TS: Dict[str, int] = {}
-LAST_ONE_LINE_ALERT_END_TS: Dict[str, int] = {}
-LAST_ALERT_TIME: Dict[Tuple[str, str], float] = {}
+# 按最近写入排序；超过 ALERT_STATE_MAX 条时淘汰最久未更新的键，防止常驻进程里无限增长
+ALERT_STATE_MAX = 1024
+LAST_PRICE_ALERT_END_TS: "OrderedDict[str, int]" = OrderedDict()
+LAST_ONE_LINE_ALERT_END_TS: "OrderedDict[str, int]" = OrderedDict()
+LAST_ALERT_TIME: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+def _remember(state: OrderedDict, key, value):
+    state[key] = value
+    state.move_to_end(key)
+    if len(state) > ALERT_STATE_MAX:
+        state.popitem(last=False)
+
+def _prune_alert_state(symbols: List[str]):
+    """配置里已移除的 symbol 不再保留去重/冷却状态。"""
+    keep = set(symbols)
+    for state in (LAST_PRICE_ALERT_END_TS, LAST_ONE_LINE_ALERT_END_TS):
+        for k in [k for k in state if k not in keep]:
+            del state[k]
+    for k in [k for k in LAST_ALERT_TIME if k[0] not in keep]:
+        del LAST_ALERT_TIME[k]
 
 def _cooldown_ok(symbol: str, kind: str, cooldown_minutes: int) -> bool:
     if cooldown_minutes <= 0: return True
@@ -281,84 +407,79 @@ def _cooldown_ok(symbol: str, kind: str, cooldown_minutes: int) -> bool:
     now = time.time()
     last = LAST_ALERT_TIME.get(key, 0)
     if now - last >= cooldown_minutes * 60:
-        LAST_ALERT_TIME[key] = now
+        _remember(LAST_ALERT_TIME, key, now)
         return True
     return False
 
 # ================== 价格偏差：A(BITDA) vs B(BINANCE) ==================
-def _check_price_deviation(cursor, table: str, symbol: str, A_ID: str, B_ID: str,
+_PRICE_FIELDS = ("OPEN", "HIGH", "LOW", "CLOSE")  # 与 RecentRow 中 ts_ms 之后的列顺序一致
+
+def _to_f(x) -> float:
+    try: return float(x)
+    except Exception: return 0.0
+
+def _check_price_deviation(rows_a: List[RecentRow], rows_b: List[RecentRow], symbol: str, A_ID: str, B_ID: str,
                            thresholds: Tuple[bool, float, float, float, float],
-                           app_config: dict, teams_cfg: dict,
-                           cooldown_min: int, interval_ms: int):
+                           app_config: dict, teams_cfg: dict, cooldown_min: int):
     enabled, th_open, th_high, th_low, th_close = thresholds
     if not enabled:
-        logger.info(f"[{symbol}] 价格偏差告警关闭，跳过。")
+        logger.info("[%s] 价格偏差告警关闭，跳过。", symbol)
         return
 
-    rows_a = _select_recent_rows(cursor, table, symbol, A_ID, RECENT_LIMIT, interval_ms)
-    rows_b = _select_recent_rows(cursor, table, symbol, B_ID, RECENT_LIMIT, interval_ms)
     if not rows_a or not rows_b:
-        logger.warning(f"[{symbol}] 价格对比：A/B 任一侧无数据，跳过。")
+        logger.warning("[%s] 价格对比：A/B 任一侧无数据，跳过。", symbol)
         return
 
-    set_a = {r['ts_ms'] for r in rows_a}
-    set_b = {r['ts_ms'] for r in rows_b}
-    commons = sorted(list(set_a & set_b))
-    if not commons:
+    # ts -> 行（倒序建表，规整后若有重复 ts 仍取 DESC 结果中的第一条，与逐行查找一致）
+    map_a = {r.ts_ms: r for r in reversed(rows_a)}
+    map_b = {r.ts_ms: r for r in reversed(rows_b)}
+    common = map_a.keys() & map_b.keys()
+    if not common:
         # 打印两侧最近三根时间，帮助定位
-        def head_ts(arr): return [format_timestamp(x['ts_ms']) for x in arr[:3]]
-        logger.warning(f"[{symbol}] 价格对比：最近窗口 A/B 无共同时间戳。A最近3根: {head_ts(rows_a)} | B最近3根: {head_ts(rows_b)}")
+        def head_ts(arr): return [format_timestamp(x.ts_ms) for x in arr[:3]]
+        logger.warning("[%s] 价格对比：最近窗口 A/B 无共同时间戳。A最近3根: %s | B最近3根: %s", symbol, head_ts(rows_a), head_ts(rows_b))
         return
 
-    kline_ts = commons[-1]
+    kline_ts = max(common)
     kline_start_str = format_timestamp(kline_ts)
 
     if LAST_PRICE_ALERT_END_TS.get(symbol) == kline_ts:
-        logger.info(f"[{symbol}] 价格对比：同一窗口已处理（K线开始: {kline_start_str}），抑制重复。")
+        logger.info("[%s] 价格对比：同一窗口已处理（K线开始: %s），抑制重复。", symbol, kline_start_str)
         return
 
-    rec_a = next(r for r in rows_a if r['ts_ms'] == kline_ts)
-    rec_b = next(r for r in rows_b if r['ts_ms'] == kline_ts)
-
-    def to_f(x):
-        try: return float(x)
-        except Exception: return 0.0
+    rec_a, rec_b = map_a[kline_ts], map_b[kline_ts]
 
-    ao, ah, al, ac = map(to_f, (rec_a['open'], rec_a['high'], rec_a['low'], rec_a['close']))
-    bo, bh, bl, bc = map(to_f, (rec_b['open'], rec_b['high'], rec_b['low'], rec_b['close']))
-
-    def rel(a, b):
-        return 0.0 if b == 0 else (a - b) / b
-
-    pairs = {
-        "OPEN":  (ao, bo, (ao - bo), abs(ao - bo), abs(rel(ao, bo)), th_open),
-        "HIGH":  (ah, bh, (ah - bh), abs(ah - bh), abs(rel(ah, bh)), th_high),
-        "LOW":   (al, bl, (al - bl), abs(al - bl), abs(rel(al, bl)), th_low),
-        "CLOSE": (ac, bc, (ac - bc), abs(ac - bc), abs(rel(ac, bc)), th_close),
-    }
-
-    header = f"{'项':<6}|{('A('+A_ID+')'):<16}|{('B('+B_ID+')'):<16}|{'差值(A-B)':<14}|{'绝对差':<14}|{'相对差':<10}|{'阈值':<10}|结果"
-    sep = "-" * (6+1+16+1+16+1+14+1+14+1+10+1+10+1+4)
-    logger.info(f"[{symbol}] 价格对比明细（比对K线开始: {kline_start_str}）：")
-    logger.info(header); logger.info(sep)
+    # 明细表只在 DEBUG 级别输出：默认 INFO 下不拼表头/逐行格式化
+    detail = logger.isEnabledFor(logging.DEBUG)
+    if detail:
+        header = f"{'项':<6}|{('A('+A_ID+')'):<16}|{('B('+B_ID+')'):<16}|{'差值(A-B)':<14}|{'绝对差':<14}|{'相对差':<10}|{'阈值':<10}|结果"
+        sep = "-" * (6+1+16+1+16+1+14+1+14+1+10+1+10+1+4)
+        logger.debug("[%s] 价格对比明细（比对K线开始: %s）：", symbol, kline_start_str)
+        logger.debug(header); logger.debug(sep)
+    # 四价一次 zip 逐项计算：相对差 = |A-B| / |B|（B 为 0 时记 0）
     breaches = []
-    for name in ("OPEN","HIGH","LOW","CLOSE"):
-        a_val, b_val, diff, abs_diff, rel_diff, thr = pairs[name]
+    for name, a_val, b_val, thr in zip(_PRICE_FIELDS, map(_to_f, rec_a[1:]), map(_to_f, rec_b[1:]),
+                                       (th_open, th_high, th_low, th_close)):
+        diff = a_val - b_val
+        abs_diff = abs(diff)
+        rel_diff = abs_diff / abs(b_val) if b_val else 0.0
         over = rel_diff > thr
-        result = "🚨 超阈" if over else "✅ 正常"
-        logger.info(f"{name:<6}|{a_val:<16.6g}|{b_val:<16.6g}|{diff:<14.6g}|{abs_diff:<14.6g}|{rel_diff:<10.2%}|{thr:<10.2%}|{result}")
+        if detail:
+            result = "🚨 超阈" if over else "✅ 正常"
+            logger.debug(f"{name:<6}|{a_val:<16.6g}|{b_val:<16.6g}|{diff:<14.6g}|{abs_diff:<14.6g}|{rel_diff:<10.2%}|{thr:<10.2%}|{result}")
         if over:
             breaches.append((name, a_val, b_val, diff, abs_diff, rel_diff, thr))
-    logger.info(sep)
+    if detail:
+        logger.debug(sep)
 
     if not breaches:
-        logger.info(f"[{symbol}] 价格对比：✅ 全部未超阈（K线开始: {kline_start_str}）。")
-        LAST_PRICE_ALERT_END_TS[symbol] = kline_ts
+        logger.info("[%s] 价格对比：✅ 全部未超阈（K线开始: %s）。", symbol, kline_start_str)
+        _remember(LAST_PRICE_ALERT_END_TS, symbol, kline_ts)
         return
 
     if not _cooldown_ok(symbol, "price", cooldown_min):
-        logger.info(f"[{symbol}] 价格对比：处于冷却期，跳过发送（K线开始: {kline_start_str}）。")
-        LAST_PRICE_ALERT_END_TS[symbol] = kline_ts
+        logger.info("[%s] 价格对比：处于冷却期，跳过发送（K线开始: %s）。", symbol, kline_start_str)
+        _remember(LAST_PRICE_ALERT_END_TS, symbol, kline_ts)
         return
 
     lines = [
@@ -374,28 +495,27 @@ def _check_price_deviation(cursor, table: str, symbol: str, A_ID: str, B_ID: str
     send_teams_alert(teams_cfg, title, text, severity="warning")
     send_lark_alert(app_config or {}, title, text)
 
-    LAST_PRICE_ALERT_END_TS[symbol] = kline_ts
+    _remember(LAST_PRICE_ALERT_END_TS, symbol, kline_ts)
 
 # ================== 一字线（仅 BITDA） ==================
-def _check_one_line(cursor, table: str, symbol: str, A_ID: str,
+def _check_one_line(rows: List[RecentRow], symbol: str, A_ID: str,
                     params: Tuple[bool, int, float, int, int],
-                    app_config: dict, teams_cfg: dict, interval_ms: int):
+                    app_config: dict, teams_cfg: dict):
     enabled, count_threshold, eps, require_streak, cooldown_min = params
     if not enabled:
-        logger.info(f"[{symbol}] 一字线告警关闭，跳过。")
+        logger.info("[%s] 一字线告警关闭，跳过。", symbol)
         return
 
-    rows = _select_recent_rows(cursor, table, symbol, A_ID, RECENT_LIMIT, interval_ms)
     if not rows:
-        logger.warning(f"[{symbol}] 一字线：BITDA 无K线数据，跳过。"); return
+        logger.warning("[%s] 一字线：BITDA 无K线数据，跳过。", symbol); return
 
-    latest_ts = rows[0]['ts_ms']
+    latest_ts = rows[0].ts_ms
     formatted_end = format_timestamp(latest_ts)
 
     one_count = 0
     for r in rows:
         try:
-            o, h, l, c = float(r['open']), float(r['high']), float(r['low']), float(r['close'])
+            o, h, l, c = float(r.open), float(r.high), float(r.low), float(r.close)
         except Exception:
             break
         if _is_one_line(o, h, l, c, eps):
@@ -403,20 +523,20 @@ def _check_one_line(cursor, table: str, symbol: str, A_ID: str,
         else:
             break
 
-    logger.info(f"[{formatted_end}][{symbol}] 一字线连续：{one_count} 条（阈值 {count_threshold}，eps={eps}）")
+    logger.info("[%s][%s] 一字线连续：%d 条（阈值 %s，eps=%s）", formatted_end, symbol, one_count, count_threshold, eps)
 
     if one_count >= count_threshold:
         end_ts = int(latest_ts)
         if LAST_ONE_LINE_ALERT_END_TS.get(symbol) == end_ts:
-            logger.info(f"[{symbol}] 一字线：同一窗口已报警，跳过重复。")
+            logger.info("[%s] 一字线：同一窗口已报警，跳过重复。", symbol)
             return
 
         if not _cooldown_ok(symbol, "one_line", cooldown_min):
-            logger.info(f"[{symbol}] 一字线：处于冷却期，跳过发送。")
-            LAST_ONE_LINE_ALERT_END_TS[symbol] = end_ts
+            logger.info("[%s] 一字线：处于冷却期，跳过发送。", symbol)
+            _remember(LAST_ONE_LINE_ALERT_END_TS, symbol, end_ts)
             return
 
-        start_ts = rows[one_count - 1]['ts_ms'] if one_count - 1 < len(rows) else latest_ts
+        start_ts = rows[one_count - 1].ts_ms if one_count - 1 < len(rows) else latest_ts
         title = f"❗ K线异常告警: {symbol} 连续一字线 ({one_count} 条)"
         text = (
             f"平台 {A_ID} 的 {symbol} 连续 {one_count} 个周期出现一字线。\n"
@@ -425,13 +545,27 @@ def _check_one_line(cursor, table: str, symbol: str, A_ID: str,
         )
         send_teams_alert(teams_cfg, title, text, severity="warning")
         send_lark_alert(app_config or {}, title, text)
-        LAST_ONE_LINE_ALERT_END_TS[symbol] = end_ts
+        _remember(LAST_ONE_LINE_ALERT_END_TS, symbol, end_ts)
 
 # ================== 主流程 ==================
+# (platform_id, base_url) -> 连接器：跨周期复用 HTTP 会话（keep-alive）与限速状态；配置热更 URL 时自动新建
+_CONNECTORS: Dict[Tuple[str, str], PlatformConnector] = {}
+
+def _get_connector(platform_id: str, base_url: str) -> PlatformConnector:
+    key = (platform_id, base_url)
+    connector = _CONNECTORS.get(key)
+    if connector is None:
+        # 同一平台的旧 URL 连接器不再使用：关闭其会话，避免长连接残留
+        for stale in [k for k in _CONNECTORS if k[0] == platform_id]:
+            _CONNECTORS.pop(stale).close()
+        connector = _CONNECTORS[key] = PlatformConnector(platform_id, base_url)
+    return connector
+
 def check_kline_alerts(conn, config):
     symbols = _get_symbols(config)
     if not symbols:
         return
+    _prune_alert_state(symbols)
 
     ex_conf = config['EXCHANGE_CONFIG']
     table_names = config['TABLE_NAMES']
@@ -450,27 +584,67 @@ def check_kline_alerts(conn, config):
         logger.critical("EXCHANGE_CONFIG 缺少 PLATFORM_A_API_URL 或 BINANCE_API_URL，请在 config.toml 中补全。")
         return
 
-    conn_a = PlatformConnector(A_ID, A_URL)
-    conn_b = PlatformConnector(B_ID, B_URL)
+    conn_a = _get_connector(A_ID, A_URL)
+    conn_b = _get_connector(B_ID, B_URL)
 
-    cursor = conn.cursor(cursor=pymysql.cursors.DictCursor)
+    cursor = conn.cursor()  # 元组游标：热路径上的 SELECT 按列位置取值
     logger.info("=" * 70)
     logger.info(f"📢 开始：拉取最新K线入库 → 一字线（{A_ID}）+ 四价偏差（{A_ID} vs {B_ID}），TF={timeframe}, interval_ms={interval_ms}")
 
+    table = table_names['KLINE_DATA']
+
+    # 1) 拉取（两侧，全部 symbol），汇总后一次入库、一次提交
+    #    1a) 各 (exchange, symbol) 的增量起点：内存水位；首次/新增 symbol 时主线程一次 GROUP BY 读库预热
+    try:
+        latest_map = _latest_watermarks(cursor, table, [A_ID, B_ID], symbols)
+    except pymysql.Error as db_err:
+        logger.error(f"读取最新时间戳失败，本轮按空表回补: {db_err}", exc_info=True)
+        conn.rollback()
+        latest_map = {}
+    jobs: Dict[str, List[Tuple[str, int, Optional[int]]]] = {}
+    for ex_id in (A_ID, B_ID):
+        jobs[ex_id] = []
+        for symbol in symbols:
+            latest_ts = latest_map.get((ex_id, symbol.upper()))
+            jobs[ex_id].append((symbol, _resolve_start_ms(latest_ts, ex_id, symbol, interval_ms), latest_ts))
+
+    #    1b) A/B 两侧并发拉取：每个交易所一个线程，两边的网络等待互相重叠
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(_fetch_side, connector, ex_id, jobs[ex_id], timeframe, interval_ms)
+                   for connector, ex_id in ((conn_a, A_ID), (conn_b, B_ID))]
+        pending: List[tuple] = [row for f in futures for row in f.result()]
+
+    try:
+        _flush_upserts(conn, cursor, table, pending)
+        _advance_watermarks(pending)
+    except pymysql.Error as db_err:
+        logger.error(f"批量入库失败（{len(pending)} 条）: {db_err}", exc_info=True)
+        conn.rollback()
+
+    # 2) 一次查询读回两侧全部 symbol 的最近 RECENT_LIMIT 根，价格偏差与一字线共用 A 侧数据
+    try:
+        recent_map = _select_recent_rows_bulk(cursor, table,
+                                              [(ex_id, symbol) for symbol in symbols for ex_id in (A_ID, B_ID)],
+                                              RECENT_LIMIT, interval_ms)
+    except pymysql.Error as db_err:
+        logger.error(f"读取最近K线失败，本轮跳过检查: {db_err}", exc_info=True)
+        conn.rollback()
+        symbols = []
+
+    # 3) 逐 symbol 检查（基于已入库的最新数据）
     for symbol in symbols:
         try:
-            # 1) 拉取并入库（两侧）
-            _ingest_latest_for(conn, cursor, table_names['KLINE_DATA'], conn_a, A_ID, symbol, timeframe, interval_ms)
-            _ingest_latest_for(conn, cursor, table_names['KLINE_DATA'], conn_b, B_ID, symbol, timeframe, interval_ms)
+            rows_a = recent_map.get((A_ID, symbol.upper()), [])
+            rows_b = recent_map.get((B_ID, symbol.upper()), [])
 
-            # 2) 价格偏差（最新共同K线）
+            # 价格偏差（最新共同K线）
             price_thresholds = _read_price_thresholds(config, symbol)
-            _check_price_deviation(cursor, table_names['KLINE_DATA'], symbol, A_ID, B_ID,
-                                   price_thresholds, lark_app_config, teams_cfg, cooldown_min, interval_ms)
+            _check_price_deviation(rows_a, rows_b, symbol, A_ID, B_ID,
+                                   price_thresholds, lark_app_config, teams_cfg, cooldown_min)
 
-            # 3) 一字线（A_ID）
+            # 一字线（A_ID）
             one_line_params = _read_one_line_thresholds(config, symbol)
-            _check_one_line(cursor, table_names['KLINE_DATA'], symbol, A_ID, one_line_params, lark_app_config, teams_cfg, interval_ms)
+            _check_one_line(rows_a, symbol, A_ID, one_line_params, lark_app_config, teams_cfg)
 
         except pymysql.Error as db_err:
             logger.error(f"[{symbol}] 数据库失败: {db_err}", exc_info=True)
@@ -483,15 +657,48 @@ def check_kline_alerts(conn, config):
     logger.info("=" * 70)
 
 def main():
-    setup_logging()
+    global TIMESTAMP_IS_DATETIME
+    setup_logging('kline_monitor_log.log')
     conn = None
     try:
         config = load_config()
         conn = init_db(config)
+        table = (config.get('TABLE_NAMES') or {}).get('KLINE_DATA') or 'kline_data'
+        try:
+            detected = timestamp_is_datetime(conn, table)
+            if detected is None:
+                logger.warning(f"未能探测 {table}.timestamp 类型（空表？），沿用 TIMESTAMP_IS_DATETIME={TIMESTAMP_IS_DATETIME}")
+            else:
+                TIMESTAMP_IS_DATETIME = detected
+        except pymysql.Error as e:
+            logger.warning(f"timestamp 列类型探测失败（沿用默认）：{e}")
+        logger.info(f"{table}.timestamp 列类型：{'DATETIME' if TIMESTAMP_IS_DATETIME else 'BIGINT(毫秒)'}")
         frequency = int(config['EXCHANGE_CONFIG'].get('FREQUENCY_SECONDS', 60))
         logger.info(f"K 线监控脚本已启动，运行频率为每 {frequency} 秒一次...")
 
         while True:
+            # 保证连接可用：空闲断开（wait_timeout）/网络闪断后自动重连，不让一次断线终止进程；
+            # 发生过重连（服务端线程 id 变化）时丢弃内存水位，断线期间的库内变化由重新预热补上
+            try:
+                thread_id = conn.server_thread_id
+                conn.ping(reconnect=True)
+                if conn.server_thread_id != thread_id:
+                    _reset_watermarks()
+            except Exception:
+                logger.warning("数据库连接失效，尝试重新建立连接…")
+                _reset_watermarks()
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                try:
+                    conn = init_db(config)
+                except Exception as e:
+                    # 库仍不可用：记录后等下一轮再试，不退出监控
+                    logger.error("数据库重连失败，%d 秒后重试: %s", frequency, e)
+                    time.sleep(frequency)
+                    continue
+
             config = load_config()
             check_kline_alerts(conn, config)
             time.sleep(frequency)
@@ -502,7 +709,11 @@ def main():
         logger.critical(f"K 线脚本发生致命错误，正在退出: {e}", exc_info=True)
     finally:
         if conn:
-            conn.close(); logger.info("数据库连接已关闭。程序退出。")
+            try:
+                conn.close()
+            except Exception:
+                pass  # 重连失败时旧连接已关闭
+            logger.info("数据库连接已关闭。程序退出。")
 
 if __name__ == '__main__':
     main()
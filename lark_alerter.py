@@ -1,12 +1,34 @@
 # lark_alerter.py
 import requests
 import logging
-import json
 import time
 import re
+import queue
+import atexit
+import threading
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils import config_cache
+
+try:
+    import orjson                      # 可选：pip install orjson（C 实现，编码更快）
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    import json
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
 
 logger = logging.getLogger('monitor_system')
 
+# 模块级会话：Token 刷新与消息推送复用同一 TLS 连接（keep-alive），连续告警不再每条重新握手；
+# Retry 默认不重试 POST 的读失败，只重试建连失败，不会造成重复消息
+_LARK_SESSION = requests.Session()
+_LARK_SESSION.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4,
+                                            max_retries=Retry(total=2, backoff_factor=0.2)))
+
 _ACCESS_TOKEN = {'token': None, 'expires_at': 0, 'app_id': None}
 
 def _base_urls(lark_region: str):
@@ -31,7 +53,7 @@ def _get_access_token(app_id, app_secret, lark_region='larksuite'):
     payload = {"app_id": app_id, "app_secret": app_secret}
 
     try:
-        resp = requests.post(auth_url, json=payload, timeout=12)
+        resp = _LARK_SESSION.post(auth_url, json=payload, timeout=12)
         data = resp.json()
         if resp.status_code == 200 and data.get('code') == 0:
             token = data['tenant_access_token']
@@ -54,6 +76,8 @@ def _get_access_token(app_id, app_secret, lark_region='larksuite'):
         logger.error(f"Token 获取过程中发生未知错误: {e}")
         return None
 
+_USER_ID_RE = re.compile(r"[0-9a-zA-Z_-]{16,64}")
+
 def _infer_receive_id_type(receive_id: str) -> str:
     """根据 receive_id 自动判断类型"""
     if receive_id.startswith("oc_"):
@@ -62,11 +86,94 @@ def _infer_receive_id_type(receive_id: str) -> str:
         return "open_id"
     if "@" in receive_id:
         return "email"
-    if re.fullmatch(r"[0-9a-zA-Z_-]{16,64}", receive_id):
+    if _USER_ID_RE.fullmatch(receive_id):
         return "user_id"
     return "chat_id"
 
+# 'targets'：(receive_id, lark_region) -> (receive_id_type, 消息 URL)；utils.config_cache，随 lark_config 对象失效
+_TARGET_CACHE: dict = {}
+
+def _message_target(lark_config: dict, receive_id: str, lark_region: str):
+    targets = config_cache(_TARGET_CACHE, lark_config, 'targets')['targets']
+    key = (receive_id, lark_region)
+    target = targets.get(key)
+    if target is None:
+        receive_id_type = _infer_receive_id_type(receive_id)
+        _, im_url = _base_urls(lark_region)
+        target = targets[key] = (receive_id_type, f"{im_url}?receive_id_type={receive_id_type}")
+    return target
+
+# ---- 后台发送：监控循环只入队，HTTP 往返由单个工作线程完成 ----
+ALERT_QUEUE_MAX = 256       # 队列满时丢弃并记录日志，绝不阻塞监控循环
+DEDUP_WINDOW_SEC = 60       # 同一 (title, text) 在窗口内只发送一次
+EXIT_FLUSH_SEC = 15         # 进程退出时最多等待队列发完的秒数
+RECENT_ALERTS_MAX = 1024    # 去重记录上限：窗口内告警突增时按时间淘汰最旧的
+
+_ALERT_QUEUE: "queue.Queue" = queue.Queue(maxsize=ALERT_QUEUE_MAX)
+_RECENT_ALERTS: "OrderedDict[tuple, float]" = OrderedDict()   # (title, text) -> 入队时间，按时间先后
+_WORKER = {'thread': None}
+_LOCK = threading.Lock()
+
+def _worker():
+    while True:
+        lark_config, title, text = _ALERT_QUEUE.get()
+        try:
+            _do_send(lark_config, title, text)
+        except Exception as e:
+            logger.error(f"Lark 后台发送线程异常: {e}. 标题: {title}", exc_info=True)
+        finally:
+            _ALERT_QUEUE.task_done()
+
+def _flush_on_exit():
+    """退出前等待已入队告警发完（工作线程为 daemon，不等待会直接丢失）。"""
+    deadline = time.time() + EXIT_FLUSH_SEC
+    while _ALERT_QUEUE.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.1)
+    if _ALERT_QUEUE.unfinished_tasks:
+        logger.warning(f"退出时仍有 {_ALERT_QUEUE.unfinished_tasks} 条 Lark 告警未发送。")
+
+def _ensure_worker():
+    if _WORKER['thread'] is None or not _WORKER['thread'].is_alive():
+        if _WORKER['thread'] is None:
+            atexit.register(_flush_on_exit)
+        t = threading.Thread(target=_worker, name="lark-alert-sender", daemon=True)
+        t.start()
+        _WORKER['thread'] = t
+
+def _is_duplicate(title, text) -> bool:
+    now = time.time()
+    while _RECENT_ALERTS:
+        _, ts = next(iter(_RECENT_ALERTS.items()))
+        if now - ts < DEDUP_WINDOW_SEC:
+            break
+        _RECENT_ALERTS.popitem(last=False)
+    key = (title, text)
+    if key in _RECENT_ALERTS:
+        return True
+    _RECENT_ALERTS[key] = now
+    if len(_RECENT_ALERTS) > RECENT_ALERTS_MAX:
+        _RECENT_ALERTS.popitem(last=False)
+    return False
+
 def send_lark_alert(lark_config, title, text):
+    """
+    异步发送 Lark 告警：入队后立即返回，由后台线程调用 _do_send。
+    DEDUP_WINDOW_SEC 内相同 (title, text) 的告警只发送一次；队列满时丢弃并记录错误。
+    """
+    with _LOCK:
+        if _is_duplicate(title, text):
+            logger.info(f"Lark 告警 {DEDUP_WINDOW_SEC}s 内重复，跳过。标题: {title}")
+            return
+        _ensure_worker()
+    try:
+        _ALERT_QUEUE.put_nowait((lark_config, title, text))
+    except queue.Full:
+        # 未真正入队：撤销去重记录，窗口内的重试仍可发送
+        with _LOCK:
+            _RECENT_ALERTS.pop((title, text), None)
+        logger.error(f"Lark 告警队列已满（{ALERT_QUEUE_MAX}），丢弃。标题: {title}")
+
+def _do_send(lark_config, title, text):
     """
     使用 Tenant Access Token 发送 Lark 告警消息到指定对象（群聊/用户）。
     必填：APP_ID, APP_SECRET, ALERT_CHAT_ID
@@ -86,16 +193,15 @@ def send_lark_alert(lark_config, title, text):
         logger.error("无法获取 Access Token，告警发送失败。")
         return
 
-    receive_id_type = _infer_receive_id_type(receive_id)
+    receive_id_type, url = _message_target(lark_config, receive_id, lark_region)
 
     message_content = {"text": f"{title}\n\n{text}"}
-    _, im_url = _base_urls(lark_region)
-    url = f"{im_url}?receive_id_type={receive_id_type}"
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    payload = {"receive_id": receive_id, "msg_type": "text", "content": json.dumps(message_content)}
+    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json; charset=utf-8"}
+    # content 字段本身要求是 JSON 字符串；外层 payload 直接序列化为 bytes，跳过 requests 内部的 json.dumps
+    payload = {"receive_id": receive_id, "msg_type": "text", "content": _dumps(message_content).decode("utf-8")}
 
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=12)
+        resp = _LARK_SESSION.post(url, headers=headers, data=_dumps(payload), timeout=12)
         try:
             data = resp.json()
         except Exception:
@@ -1,10 +1,22 @@
 # platform_connector.py
 import time
 import logging
+import threading
 from datetime import datetime
 from typing import List, Optional, Any, Dict
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson                      # 可选：pip install orjson（C 实现，解析大段 K 线更快）
+    def _loads(raw: bytes):
+        return orjson.loads(raw)
+except ImportError:
+    import json
+    def _loads(raw: bytes):
+        return json.loads(raw)
 
 logger = logging.getLogger('monitor_system')
 
@@ -25,6 +37,26 @@ def _safe_float(x, default=0.0) -> float:
         return default
 
 
+class _TokenBucket:
+    """令牌桶限速：按 rate 个/秒补充，最多积攒 capacity 个；acquire 返回调用方需要 sleep 的秒数。"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.ts = time.monotonic()  # 单调时钟，不受系统校时影响
+        self.lock = threading.Lock()
+
+    def acquire(self, n: float = 1) -> float:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+            self.ts = now
+            # 先预扣（可为负），并发调用方会各自排到后面的时间片，不会同时放行
+            self.tokens -= n
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
 class PlatformConnector:
     """
     统一接口：
@@ -32,23 +64,19 @@ class PlatformConnector:
     """
 
     # timeframe 映射
-    _TF_MAP_BITDA = {
-        "1m": "1min", "3m": "3min", "5m": "5min",
-        "15m": "15min", "30m": "30min",
-        "1h": "1hour", "4h": "4hour", "6h": "6hour", "12h": "12hour",
-        "1d": "1day", "1w": "1week"
-    }
     _TF_MAP_BINANCE = {
         "1m": "1m", "3m": "3m", "5m": "5m", "15m": "15m", "30m": "30m",
         "1h": "1h", "2h": "2h", "4h": "4h", "6h": "6h", "8h": "8h", "12h": "12h",
         "1d": "1d", "1w": "1w"
     }
 
-    # timeframe → 秒（便于计算 end_time）
-    _TF_TO_SECONDS = {
-        "1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800,
-        "1h": 3600, "2h": 7200, "4h": 14400, "6h": 21600, "8h": 28800, "12h": 43200,
-        "1d": 86400, "1w": 604800
+    # timeframe → (BITDA 周期名, 秒)：秒数用于计算 end_time；未列出的周期原样透传、按 1m 计
+    _TF_INFO_BITDA = {
+        "1m": ("1min", 60), "3m": ("3min", 180), "5m": ("5min", 300),
+        "15m": ("15min", 900), "30m": ("30min", 1800),
+        "1h": ("1hour", 3600), "2h": ("2h", 7200), "4h": ("4hour", 14400), "6h": ("6hour", 21600),
+        "8h": ("8h", 28800), "12h": ("12hour", 43200),
+        "1d": ("1day", 86400), "1w": ("1week", 604800)
     }
 
     # 如需符号映射（某平台命名不同），可在此配置
@@ -60,11 +88,16 @@ class PlatformConnector:
     # 为 BITDA 计算 end_time 时使用的窗口大小（根数）
     _BITDA_WINDOW_CANDLES = 200  # 可按需调整
 
-    def __init__(self, platform_id: str, base_url: str, timeout: int = 10):
+    def __init__(self, platform_id: str, base_url: str, timeout: int = 10, burst: int = 1):
         self.platform_id = platform_id.upper().strip()
         self.base_url = base_url.rstrip("/")
         self.timeout = timeout
+        # 长连接池 + 连接级重试（GET 幂等）；连接器由调用方跨周期复用
         self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2,
+                              max_retries=Retry(total=2, backoff_factor=0.5))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
         # 调试/诊断字段
         self.last_request: Dict[str, Any] = {}
@@ -72,9 +105,22 @@ class PlatformConnector:
         self.last_response_text: Optional[str] = None
         self.last_error: Optional[str] = None
 
-        # 简单限速（避免 1r/s 限速触发）
-        self._last_call_ts: float = 0.0
+        # 令牌桶限速（避免 1r/s 限速触发）：长期平均不超过 1/_min_interval_sec 次/秒；
+        # burst 默认 1 即严格间隔，接口允许突发时可调大
         self._min_interval_sec: float = 1.05  # 保守 >1s
+        self._bucket = _TokenBucket(capacity=burst, rate=1.0 / self._min_interval_sec)
+
+        # 平台实现在构造时绑定一次，fetch 时不再逐次做前缀判断
+        if self.platform_id.startswith("BINANCE"):
+            self._fetch_impl = self._fetch_binance
+        elif self.platform_id.startswith("BITDA"):
+            self._fetch_impl = self._fetch_bitda
+        else:
+            self._fetch_impl = None
+
+    def close(self):
+        """释放连接池中的长连接（连接器被替换或进程退出时调用）。"""
+        self.session.close()
 
     # ======= 公共入口 =======
     def fetch_ohlcv_history(self, symbol: str, timeframe: str, start_time_ms: Optional[int] = None) -> Optional[List[list]]:
@@ -91,19 +137,13 @@ class PlatformConnector:
         symbol_real = self._SYMBOL_MAP.get(self.platform_id, {}).get(symbol, symbol)
 
         try:
-            if self.platform_id.startswith("BINANCE"):
-                data = self._fetch_binance(symbol_real, timeframe, start_time_ms)
-            elif self.platform_id.startswith("BITDA"):
-                data = self._fetch_bitda(symbol_real, timeframe, start_time_ms)
-            else:
+            if self._fetch_impl is None:
                 raise NotImplementedError(f"未知平台: {self.platform_id}")
-            return data
+            return self._fetch_impl(symbol_real, timeframe, start_time_ms)
         except Exception as e:
             self.last_error = f"{type(e).__name__}: {e}"
             logger.error(f"[{self.platform_id}] fetch_ohlcv_history 失败：{self.last_error} | req={self.last_request}", exc_info=True)
             return None
-        finally:
-            self._last_call_ts = time.time()
 
     # ======= 平台实现：BINANCE（期货）=======
     def _fetch_binance(self, symbol: str, timeframe: str, start_time_ms: Optional[int]) -> List[list]:
@@ -118,11 +158,7 @@ class PlatformConnector:
         }
 
         resp = self.session.get(url, params=params, timeout=self.timeout)
-        self.last_response_status = resp.status_code
-        self.last_response_text = resp.text[:5000]
-        resp.raise_for_status()
-
-        data = resp.json()
+        data = self._read_json(resp)
         out = []
         for item in data:
             if not isinstance(item, list) or len(item) < 6:
@@ -134,9 +170,12 @@ class PlatformConnector:
 
     # ======= 平台实现：BITDA =======
     def _fetch_bitda(self, symbol: str, timeframe: str, start_time_ms: Optional[int]) -> List[list]:
-        tf_std = timeframe.strip().lower()
-        tf_bitda = self._TF_MAP_BITDA.get(tf_std, tf_std)
-        tf_sec = self._TF_TO_SECONDS.get(tf_std, 60)  # 默认按1m
+        # 常规写法（"1m"）一次查表命中；只有非常规写法才做 strip/lower 再查
+        info = self._TF_INFO_BITDA.get(timeframe)
+        if info is None:
+            tf_std = timeframe.strip().lower()
+            info = self._TF_INFO_BITDA.get(tf_std, (tf_std, 60))  # 默认按1m
+        tf_bitda, tf_sec = info
 
         url = f"{self.base_url}/open/api/v2/market/kline"
 
@@ -161,15 +200,12 @@ class PlatformConnector:
             }
 
             resp = self.session.get(url, params=params, timeout=self.timeout)
-            self.last_response_status = resp.status_code
-            self.last_response_text = resp.text[:5000]
-            resp.raise_for_status()
-
-            j = resp.json()
+            j = self._read_json(resp)
             code = j.get("code")
             # code 为 0 或不返回 code 视为成功
             if code not in (0, "0", None):
                 # 将错误抛出，外层做回退
+                self.last_response_text = resp.text[:5000]
                 raise RuntimeError(f"BITDA API 返回错误 code={code}, msg={j.get('msg')}")
 
             raw = j.get("data", [])
@@ -211,6 +247,16 @@ class PlatformConnector:
             # 回退仍失败，抛给上层记录
             raise
 
+    def _read_json(self, resp) -> Any:
+        """校验状态码并解析 JSON；只在出错时才把正文解码成 str 存入 last_response_text（正常路径直接解析 bytes）"""
+        self.last_response_status = resp.status_code
+        try:
+            resp.raise_for_status()
+            return _loads(resp.content)
+        except Exception:
+            self.last_response_text = resp.text[:5000]
+            raise
+
     @staticmethod
     def _flatten_bitda_data(raw: Any) -> List[Any]:
         """
@@ -229,9 +275,8 @@ class PlatformConnector:
             return flat
         return raw
 
-    # ======= 内部：简单限速 =======
+    # ======= 内部：令牌桶限速 =======
     def _throttle(self):
-        now = time.time()
-        delta = now - self._last_call_ts
-        if delta < self._min_interval_sec:
-            time.sleep(self._min_interval_sec - delta)
+        wait = self._bucket.acquire()
+        if wait > 0:
+            time.sleep(wait)
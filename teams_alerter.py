@@ -1,9 +1,25 @@
 # teams_alerter.py
 import requests
 import logging
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson                      # 可选：pip install orjson（C 实现，编码更快）
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    import json
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode("utf-8")
 
 log = logging.getLogger("monitor_system")
 
+# 模块级会话：多段日报与各监控告警复用同一 TLS 连接（keep-alive）；发送均为顺序调用，单连接即可
+_TEAMS_SESSION = requests.Session()
+_TEAMS_SESSION.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=1,
+                                             max_retries=Retry(total=3, backoff_factor=0.5)))
+
 def send_teams_alert(teams_cfg: dict, title: str, text: str, severity: str = "info", timeout=8):
     """
     向 Teams 发送 Adaptive Card 格式的日报，保持原始排版。
@@ -47,7 +63,8 @@ def send_teams_alert(teams_cfg: dict, title: str, text: str, severity: str = "in
     }
 
     try:
-        r = requests.post(url, json=payload, timeout=timeout)
+        r = _TEAMS_SESSION.post(url, data=_dumps(payload), timeout=timeout,
+                                headers={"Content-Type": "application/json; charset=utf-8"})
         if r.status_code >= 300:
             log.error(f"[TEAMS] 发送失败 HTTP {r.status_code}: {r.text[:300]}")
         else:
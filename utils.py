@@ -1,6 +1,11 @@
 # utils.py
+import sys
+import atexit
+import queue
 import logging
+import logging.handlers
 from pathlib import Path
+from datetime import datetime
 
 logger = logging.getLogger('monitor_system')
 
@@ -14,6 +19,26 @@ ROOT = Path(__file__).resolve().parent
 CFG_MAIN  = ROOT / "config.toml"             # 固定读取脚本同目录
 CFG_LOCAL = ROOT / "config.local.toml"       # 可选：存在则覆盖差异
 
+# ---- 日志 ----
+def setup_logging(log_filename: str):
+    """
+    各脚本共用：stdout + 脚本同目录下的 log_filename，重复调用不会叠加 handler。
+    QueueHandler 在调用线程完成消息格式化后入队，写终端/文件的 I/O 由 QueueListener 后台线程完成；
+    进程退出时 atexit 停止监听器并写完队列中剩余记录。
+    """
+    if logger.handlers:
+        return
+    fmt = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
+                            datefmt='%Y-%m-%d %H:%M:%S')
+    ch = logging.StreamHandler(sys.stdout); ch.setFormatter(fmt); ch.setLevel(logging.INFO)
+    fh = logging.FileHandler(ROOT / log_filename, encoding='utf-8'); fh.setFormatter(fmt); fh.setLevel(logging.INFO)
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, ch, fh, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+
 def _load_toml(path: Path) -> dict:
     if not path.exists():
         return {}
@@ -31,8 +56,23 @@ def _deep_merge(base: dict, extra: dict) -> dict:
             out[k] = v
     return out
 
+# 按两份配置文件的 (mtime_ns, size) 缓存解析结果：文件未变时直接复用，不重复读盘与解析 TOML。
+# 用纳秒 mtime 并附带文件大小，同一秒内的快速改写也能识别
+_CONFIG_CACHE = {'mtimes': None, 'config': None}
+
+def _cfg_mtime(path: Path):
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
 def load_config() -> dict:
-    """热加载配置：config.toml + config.local.toml（后者覆盖前者，若存在）"""
+    """热加载配置：config.toml + config.local.toml（后者覆盖前者，若存在）；文件未修改时返回缓存"""
+    mtimes = (_cfg_mtime(CFG_MAIN), _cfg_mtime(CFG_LOCAL))
+    if _CONFIG_CACHE['config'] is not None and _CONFIG_CACHE['mtimes'] == mtimes:
+        return _CONFIG_CACHE['config']
+
     main_cfg  = _load_toml(CFG_MAIN)
     local_cfg = _load_toml(CFG_LOCAL)
     config = _deep_merge(main_cfg, local_cfg)
@@ -40,8 +80,37 @@ def load_config() -> dict:
     ac = (config or {}).get("ALERT_CONFIG", {}) or {}
     logger.info(f"[CONFIG] 读取: {CFG_MAIN} (+{CFG_LOCAL.name if CFG_LOCAL.exists() else '无覆盖'})")
     logger.info(f"[CONFIG] ALERT_CONFIG keys: {list(ac.keys())}")
+    _CONFIG_CACHE['mtimes'] = mtimes
+    _CONFIG_CACHE['config'] = config
     return config
 
+# ---- 大小写不敏感的配置读取 ----
+def ci_index(d: dict) -> dict:
+    """大小写不敏感视图：{key.strip().lower(): value}；同名仅保留首个（与逐项扫描匹配结果一致）"""
+    idx = {}
+    if isinstance(d, dict):
+        for k, v in d.items():
+            if isinstance(k, str):
+                idx.setdefault(k.strip().lower(), v)
+    return idx
+
+def ci_lookup(idx: dict, key: str):
+    """在 ci_index 结果中取值（未命中返回 None）"""
+    return idx.get(key.lower())
+
+# ---- 随配置对象失效的解析缓存 ----
+def config_cache(cache: dict, config: dict, *sections: str) -> dict:
+    """
+    各脚本共用的缓存写法：cache 只对当前 config 对象有效（保留引用比对身份）。load_config 仅在配置文件变化时
+    返回新对象，此时清空并重建：'ac_idx' 为 ALERT_CONFIG 的 ci_index 视图，sections 中每个名字各一个空 dict，
+    由调用方按需填入解析结果；其余时候原样返回，直接命中。
+    """
+    if cache.get('config') is not config:
+        cache.clear()
+        ac = (config or {}).get('ALERT_CONFIG', {}) or {}
+        cache.update({name: {} for name in sections}, config=config, ac_idx=ci_index(ac))
+    return cache
+
 # ---- DB ----
 import pymysql
 from pymysql import cursors
@@ -61,6 +130,39 @@ def init_db(config: dict):
     logger.info("MySQL 数据库连接成功。")
     return conn
 
+# 表名 -> timestamp 列是否为 DATETIME/TIMESTAMP（列类型在进程生命周期内不变，只探测一次）
+_TS_IS_DATETIME: dict = {}
+
+def timestamp_is_datetime(conn, table: str):
+    """
+    判断 table 的 `timestamp` 列是否为 DATETIME/TIMESTAMP（否则视为 BIGINT 毫秒）。
+    先读 information_schema，不扫数据行；元数据查不到（视图/权限受限）时退回取一行看类型；
+    两者都无结果（空表）时返回 None，由调用方决定默认值，且不缓存。
+    """
+    cached = _TS_IS_DATETIME.get(table)
+    if cached is not None:
+        return cached
+    sql = """
+        SELECT DATA_TYPE FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = 'timestamp'
+    """
+    with conn.cursor() as c:
+        c.execute(sql, (table,))
+        row = c.fetchone()
+    if row:
+        data_type = row[0] if isinstance(row, (list, tuple)) else row.get('DATA_TYPE')
+        result = str(data_type).lower() in ('datetime', 'timestamp')
+    else:
+        with conn.cursor() as c:
+            c.execute(f"SELECT timestamp FROM {table} LIMIT 1")
+            row = c.fetchone()
+        if not row:
+            return None
+        ts = row[0] if isinstance(row, (list, tuple)) else row.get('timestamp')
+        result = isinstance(ts, datetime)
+    _TS_IS_DATETIME[table] = result
+    return result
+
 def get_threshold(config, symbol_conf, key, default):
     """保持与旧代码兼容的阈值读取：优先 symbol 覆盖，其次全局 ALERT_CONFIG"""
     alert_conf = (config or {}).get('ALERT_CONFIG', {}) or {}
@@ -3,11 +3,9 @@ import time
 import logging
 from datetime import datetime
 import pymysql
-import sys
-import os
 from typing import Union, Tuple, Dict, Set, List
 
-from utils import load_config, init_db
+from utils import load_config, init_db, setup_logging, ci_index, ci_lookup, config_cache
 
 # --- 通知模块：Teams（必有，不存在就不报错） ---
 try:
@@ -32,41 +30,25 @@ _LAST_ALERTED_END_TS: Dict[str, Union[int, float, datetime]] = {}
 # 冷却：记录最后一次真实报警的 wall-clock（秒）
 _LAST_ALERT_WALLCLOCK: Dict[str, int] = {}
 
-# -------------------- 日志 --------------------
-def setup_logging():
-    if logger.handlers:
-        return
-    logger.setLevel(logging.INFO)
-    fmt = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-                            datefmt='%Y-%m-%d %H:%M:%S')
-    ch = logging.StreamHandler(sys.stdout); ch.setFormatter(fmt); ch.setLevel(logging.INFO)
-    log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'volume_monitor_log.log')
-    fh = logging.FileHandler(log_file, encoding='utf-8'); fh.setFormatter(fmt); fh.setLevel(logging.INFO)
-    root_logger = logging.getLogger('monitor_system')
-    root_logger.addHandler(ch); root_logger.addHandler(fh)
-    root_logger.setLevel(logging.INFO)
+def _prune_state(symbols: List[str]):
+    """配置里已移除的 symbol 不再保留去重/冷却状态，长期运行时缓存大小只随当前 symbol 数变化。"""
+    keep = set(symbols)
+    for state in (_LAST_CHECKED_END_TS, _LAST_ALERTED_END_TS, _LAST_ALERT_WALLCLOCK):
+        for k in [k for k in state if k not in keep]:
+            del state[k]
 
 # -------------------- 工具 --------------------
 def format_timestamp(ts: Union[int, float, datetime, None]) -> str:
     if ts is None:
         return "N/A"
     if isinstance(ts, datetime):
-        dt = ts
-    elif isinstance(ts, (int, float)):
-        # 认为是毫秒时间戳
-        dt = datetime.fromtimestamp(float(ts) / 1000.0)
-    else:
-        logger.error(f"format_timestamp 收到不支持的类型: {type(ts)}")
-        return "类型错误"
-    return dt.strftime('%Y-%m-%d %H:%M')
-
-def _ci_get(d: dict, key: str):
-    if not isinstance(d, dict): return None, None
-    t = key.strip().lower()
-    for k, v in d.items():
-        if isinstance(k, str) and k.strip().lower() == t:
-            return v, k
-    return None, None
+        return ts.strftime('%Y-%m-%d %H:%M')
+    if isinstance(ts, (int, float)):
+        # 认为是毫秒时间戳：localtime + %-格式化，省去构造 datetime 与 strftime（仍为本地时区）
+        tm = time.localtime(ts // 1000)
+        return "%04d-%02d-%02d %02d:%02d" % (tm.tm_year, tm.tm_mon, tm.tm_mday, tm.tm_hour, tm.tm_min)
+    logger.error(f"format_timestamp 收到不支持的类型: {type(ts)}")
+    return "类型错误"
 
 def _to_float(x) -> float:
     try:
@@ -85,6 +67,9 @@ def _to_epoch_ms(x: Union[int, float, datetime, None]) -> Union[int, None]:
         return None
 
 # -------------------- 读取阈值/窗口（全局 + 按币种覆盖） --------------------
+# 按 symbol 缓存解析结果（utils.config_cache：随 config 对象失效）
+_PARAMS_CACHE: dict = {}
+
 def _read_volume_params(config: dict, symbol: str) -> Tuple[float, float, int, int]:
     """
     返回：
@@ -93,18 +78,25 @@ def _read_volume_params(config: dict, symbol: str) -> Tuple[float, float, int, i
       cooldown_min: int               (默认 0)
       window_len:   int (candles)     (默认 15，可被 SYMBOL_THRESHOLDS 覆盖)
     """
+    pc = config_cache(_PARAMS_CACHE, config, 'volume')
+    cached = pc['volume'].get(symbol)
+    if cached is not None:
+        return cached
+
     ac = (config or {}).get('ALERT_CONFIG', {}) or {}
-    sym_map = _ci_get(ac, 'SYMBOL_THRESHOLDS')[0] or {}
+    ac_idx = pc['ac_idx']
+    sym_map = ci_lookup(ac_idx, 'SYMBOL_THRESHOLDS') or {}
     sym_conf = sym_map.get(symbol) or {}
+    sym_idx = ci_index(sym_conf)
 
     # 目标系数
-    sym_tr_val, _ = _ci_get(sym_conf, 'VOLUME_TARGET_RATIO')
-    glb_tr_val, _ = _ci_get(ac,       'VOLUME_TARGET_RATIO')
+    sym_tr_val = ci_lookup(sym_idx, 'VOLUME_TARGET_RATIO')
+    glb_tr_val = ci_lookup(ac_idx,  'VOLUME_TARGET_RATIO')
     target_ratio = sym_tr_val if sym_tr_val is not None else (glb_tr_val if glb_tr_val is not None else 0.20)
 
     # 偏离容差
-    sym_tol_val, _ = _ci_get(sym_conf, 'VOLUME_RATIO_THRESHOLD')
-    glb_tol_val, _ = _ci_get(ac,       'VOLUME_RATIO_THRESHOLD')
+    sym_tol_val = ci_lookup(sym_idx, 'VOLUME_RATIO_THRESHOLD')
+    glb_tol_val = ci_lookup(ac_idx,  'VOLUME_RATIO_THRESHOLD')
     tolerance = sym_tol_val if sym_tol_val is not None else (glb_tol_val if glb_tol_val is not None else 0.20)
 
     # 冷却（分钟）
@@ -127,7 +119,8 @@ def _read_volume_params(config: dict, symbol: str) -> Tuple[float, float, int, i
     except Exception: tolerance = 0.20
 
     logger.info(f"[{symbol}] 成交量阈值：target_ratio={target_ratio:.2f} | tolerance={tolerance:.2f} | window={window_len} | cooldown={cooldown_min}m")
-    return target_ratio, tolerance, cooldown_min, window_len
+    pc['volume'][symbol] = (target_ratio, tolerance, cooldown_min, window_len)
+    return pc['volume'][symbol]
 
 def _cooldown_ok(symbol: str, cooldown_min: int) -> bool:
     """基于 wall-clock 的冷却判断。"""
@@ -140,26 +133,69 @@ def _cooldown_ok(symbol: str, cooldown_min: int) -> bool:
     return (now_s - last_s) >= cooldown_min * 60
 
 # -------------------- DB 读取 --------------------
-def _select_recent_volume_rows(cursor, table: str, symbol: str, exchange: str, limit: int) -> List[dict]:
-    sql = f"""
-        SELECT timestamp, volume
-        FROM {table}
-        WHERE symbol = %s AND exchange = %s
-        ORDER BY timestamp DESC
-        LIMIT {int(limit)}
+# SQL 模板：按 (表名, 子查询段数) 只拼一次，之后每轮直接复用同一字符串
+_RECENT_VOLUME_PART_TPL = """
+    (SELECT exchange, symbol, timestamp, volume
+     FROM {table}
+     WHERE symbol = %s AND exchange = %s
+     ORDER BY timestamp DESC
+     LIMIT %s)
+"""
+_SQL_CACHE: Dict[Tuple[str, int], str] = {}
+
+def _recent_volume_sql(table: str, n_parts: int) -> str:
+    key = (table, n_parts)
+    sql = _SQL_CACHE.get(key)
+    if sql is None:
+        sql = _SQL_CACHE[key] = " UNION ALL ".join([_RECENT_VOLUME_PART_TPL.format(table=table)] * n_parts)
+    return sql
+
+def _select_recent_volume_rows_bulk(cursor, table: str, jobs: List[Tuple[str, int]],
+                                    exchanges: Tuple[str, ...]) -> Dict[Tuple[str, str], List[dict]]:
+    """
+    一次往返读回全部 symbol、各交易所最近 limit 根（jobs: [(symbol, limit)]，各 symbol 窗口可不同）：
+    每个 (symbol, exchange) 一段带 LIMIT 的子查询 UNION ALL，各自走 (symbol, exchange, timestamp) 索引。
+    返回 {(EXCHANGE, SYMBOL): rows}，组内按 timestamp 降序；无数据的组合为空列表。
     """
-    cursor.execute(sql, (symbol, exchange))
-    return cursor.fetchall() or []
+    out: Dict[Tuple[str, str], List[dict]] = {(ex.upper(), sym.upper()): [] for sym, _ in jobs for ex in exchanges}
+    if not jobs:
+        return out
+    params: list = []
+    for sym, limit in jobs:
+        for ex in exchanges:
+            params.extend((sym, ex, int(limit)))
+    cursor.execute(_recent_volume_sql(table, len(jobs) * len(exchanges)), params)
+    for r in cursor.fetchall() or []:
+        out.setdefault((str(r['exchange']).upper(), str(r['symbol']).upper()), []).append(r)
+    # UNION ALL 不保证保留各段内的 ORDER BY，组内再按 timestamp 降序排一次
+    for rows in out.values():
+        rows.sort(key=lambda r: r['timestamp'], reverse=True)
+    return out
 
 def _pick_latest_common_timestamps(rows_a: List[dict], rows_b: List[dict], need: int) -> List[Union[int, float, datetime]]:
+    """rows_a / rows_b 均按 timestamp 降序：双指针归并，凑够 need 个共同时间戳即停，升序返回。"""
     if not rows_a or not rows_b:
         return []
-    set_a = {r['timestamp'] for r in rows_a}
-    set_b = {r['timestamp'] for r in rows_b}
-    commons = sorted(list(set_a & set_b))
+    commons = []
+    i = j = 0
+    na, nb = len(rows_a), len(rows_b)
+    while i < na and j < nb:
+        ta = rows_a[i]['timestamp']
+        tb = rows_b[j]['timestamp']
+        if ta == tb:
+            commons.append(ta)
+            if len(commons) == need:
+                break
+            i += 1
+            j += 1
+        elif ta > tb:
+            i += 1
+        else:
+            j += 1
     if len(commons) < need:
         return []
-    return commons[-need:]
+    commons.reverse()
+    return commons
 
 def _sum_vol_on_timestamps(rows: List[dict], ts_keep: Set[Union[int, float, datetime]]) -> float:
     if not rows or not ts_keep:
@@ -188,6 +224,7 @@ def compare_volume_alert(conn, config):
     if not symbols:
         logger.critical("配置缺少顶层 MONITORED_SYMBOLS（或为空）。请在 config.toml 顶层添加 MONITORED_SYMBOLS = [\"BTCUSDT\", ...]")
         return
+    _prune_state(symbols)
 
     ex_conf = config['EXCHANGE_CONFIG']
     table_names = config['TABLE_NAMES']
@@ -205,16 +242,24 @@ def compare_volume_alert(conn, config):
     logger.info("=" * 76)
     logger.info(f"📢 成交量对比开始：A={A_ID} vs B={B_ID} | TIME_FRAME={timeframe}")
 
+    # 读取阈值 + 窗口；多取一些给对齐留冗余，全部 symbol 的 A/B 数据一条查询读回
+    params_map = {symbol: _read_volume_params(config, symbol) for symbol in symbols}
+    jobs = [(symbol, max(p[3] * 2, p[3] + 5)) for symbol, p in params_map.items()]
+    try:
+        rows_map = _select_recent_volume_rows_bulk(cursor, table_names['KLINE_DATA'], jobs, (A_ID, B_ID))
+    except pymysql.Error as db_err:
+        logger.error(f"读取成交量数据失败，本轮跳过: {db_err}", exc_info=True)
+        conn.rollback()
+        cursor.close()
+        return
+
     for symbol in symbols:
         try:
-            # 读取阈值 + 窗口
-            target_ratio, tolerance, cooldown_min, window_len = _read_volume_params(config, symbol)
+            target_ratio, tolerance, cooldown_min, window_len = params_map[symbol]
             min_common = window_len
-            # 多取一些给对齐留冗余
-            fetch_n = max(window_len * 2, window_len + 5)
 
-            rows_a = _select_recent_volume_rows(cursor, table_names['KLINE_DATA'], symbol, A_ID, fetch_n)
-            rows_b = _select_recent_volume_rows(cursor, table_names['KLINE_DATA'], symbol, B_ID, fetch_n)
+            rows_a = rows_map.get((A_ID, symbol.upper()), [])
+            rows_b = rows_map.get((B_ID, symbol.upper()), [])
 
             a_latest = rows_a[0]['timestamp'] if rows_a else None
             b_latest = rows_b[0]['timestamp'] if rows_b else None
@@ -222,30 +267,27 @@ def compare_volume_alert(conn, config):
             expected_end_s = (now_s // tf_sec) * tf_sec
             expected_end_str = datetime.fromtimestamp(expected_end_s).strftime('%Y-%m-%d %H:%M')
 
-            logger.info(
-                f"[{symbol}] A最新: {format_timestamp(a_latest)} | "
-                f"B最新: {format_timestamp(b_latest)} | "
-                f"期望末尾: {expected_end_str}"
-            )
+            logger.info("[%s] A最新: %s | B最新: %s | 期望末尾: %s",
+                        symbol, format_timestamp(a_latest), format_timestamp(b_latest), expected_end_str)
 
             if len(rows_a) < window_len or len(rows_b) < window_len:
                 latest_any = a_latest or b_latest
-                logger.warning(f"[{format_timestamp(latest_any)}][{symbol}] 数据不足：A({len(rows_a)}), B({len(rows_b)}), 需≥{window_len}，跳过。")
+                logger.warning("[%s][%s] 数据不足：A(%d), B(%d), 需≥%d，跳过。",
+                               format_timestamp(latest_any), symbol, len(rows_a), len(rows_b), window_len)
                 continue
 
             commons = _pick_latest_common_timestamps(rows_a, rows_b, window_len)
             if not commons or len(commons) < min_common:
                 latest_any = a_latest or b_latest
-                logger.warning(f"[{format_timestamp(latest_any)}][{symbol}] A/B 最近窗口无足够共同时间戳（需 {window_len}），跳过。")
+                logger.warning("[%s][%s] A/B 最近窗口无足够共同时间戳（需 %d），跳过。",
+                               format_timestamp(latest_any), symbol, window_len)
                 continue
 
             common_end = commons[-1]
             common_end_ms = _to_epoch_ms(common_end)
             lag_sec = max(0, expected_end_s - int((common_end_ms or 0)//1000))
             lag_min = lag_sec // 60
-            logger.info(
-                f"[{symbol}] 共同末尾: {format_timestamp(common_end)} | 距期望末尾落后: {lag_min} 分钟"
-            )
+            logger.info("[%s] 共同末尾: %s | 距期望末尾落后: %d 分钟", symbol, format_timestamp(common_end), lag_min)
 
             ts_start, ts_end = commons[0], commons[-1]
             formatted_time_start = format_timestamp(ts_start)
@@ -253,7 +295,7 @@ def compare_volume_alert(conn, config):
 
             # 去重：同一 symbol 的同一 end_ts 不重复比对
             if _LAST_CHECKED_END_TS.get(symbol) == ts_end:
-                logger.info(f"[{symbol}] 已处理过窗口（结束 {formatted_time_end}），跳过重复计算。")
+                logger.info("[%s] 已处理过窗口（结束 %s），跳过重复计算。", symbol, formatted_time_end)
                 continue
             _LAST_CHECKED_END_TS[symbol] = ts_end
 
@@ -261,7 +303,7 @@ def compare_volume_alert(conn, config):
             A_sum = _sum_vol_on_timestamps(rows_a, keep)
             B_sum = _sum_vol_on_timestamps(rows_b, keep)
 
-            logger.info(f"[{formatted_time_end}][{symbol}] ✅ 数据对齐成功。共同 K 线数量: {len(keep)}（窗口={window_len}）。")
+            logger.info("[%s][%s] ✅ 数据对齐成功。共同 K 线数量: %d（窗口=%d）。", formatted_time_end, symbol, len(keep), window_len)
 
             target_val = target_ratio * B_sum
             if B_sum == 0 or target_val == 0:
@@ -275,16 +317,18 @@ def compare_volume_alert(conn, config):
 
             # 输出明细
             logger.info("-" * 74)
-            logger.info(f"--- 📊 {formatted_time_start} -> {formatted_time_end} | {symbol} 成交量对比（窗口 {window_len} 根） ---")
-            logger.info(f"规则：A ≈ {target_ratio:.2f} × B，允许偏差 ±{tolerance:.0%}（相对目标值）")
-            logger.info(f"A({A_ID}) 累计: {A_sum:.2f} | B({B_ID}) 累计: {B_sum:.2f} | 目标={target_val:.2f} | 偏差={rel_str}")
+            logger.info("--- 📊 %s -> %s | %s 成交量对比（窗口 %d 根） ---",
+                        formatted_time_start, formatted_time_end, symbol, window_len)
+            logger.info("规则：A ≈ %.2f × B，允许偏差 ±%.0f%%（相对目标值）", target_ratio, tolerance * 100)
+            logger.info("A(%s) 累计: %.2f | B(%s) 累计: %.2f | 目标=%.2f | 偏差=%s",
+                        A_ID, A_sum, B_ID, B_sum, target_val, rel_str)
 
             # 报警（同一 end_ts 不重复 + 冷却）
             if within:
-                logger.info(f"[{symbol}] ✅ 正常（窗口结束 {formatted_time_end}）")
+                logger.info("[%s] ✅ 正常（窗口结束 %s）", symbol, formatted_time_end)
             else:
                 if _LAST_ALERTED_END_TS.get(symbol) == ts_end:
-                    logger.info(f"[{symbol}] 已对该窗口报警过（结束 {formatted_time_end}），跳过重复推送。")
+                    logger.info("[%s] 已对该窗口报警过（结束 %s），跳过重复推送。", symbol, formatted_time_end)
                 else:
                     if _cooldown_ok(symbol, cooldown_min):
                         title = f"🚨 成交量偏离阈值: {symbol} @ {formatted_time_end} ({window_len}m 累计)"
@@ -301,7 +345,7 @@ def compare_volume_alert(conn, config):
                         _LAST_ALERTED_END_TS[symbol] = ts_end
                         _LAST_ALERT_WALLCLOCK[symbol] = int(time.time())
                     else:
-                        logger.info(f"[{symbol}] 报警处于冷却期，跳过发送（窗口结束 {formatted_time_end}）。")
+                        logger.info("[%s] 报警处于冷却期，跳过发送（窗口结束 %s）。", symbol, formatted_time_end)
 
             logger.info("-" * 74)
 
@@ -316,7 +360,7 @@ def compare_volume_alert(conn, config):
     logger.info("=" * 76)
 
 def main():
-    setup_logging()
+    setup_logging('volume_monitor_log.log')
     conn = None
     try:
         config = load_config()